@@ -0,0 +1,281 @@
+"""Benchmarks for the pdprocessor pipeline.
+
+Run the benchmarks and write the results as json:
+
+    python benchmarks/bench.py --output results.json
+
+Compare a run against a baseline. A scenario slower than the baseline by
+more than the tolerance fails the run with exit status 1:
+
+    python benchmarks/bench.py --baseline benchmarks/baseline.json --tolerance 0.25
+
+make bench compares against benchmarks/baseline.json, which is committed.
+Timings depend on the machine, so refresh the baseline with make
+bench-baseline on the machine running the comparison, and commit it again
+when a change is meant to alter the timings.
+
+The synthetic inputs vary in rows, width (extra unused columns) and
+cardinality (distinct values of the string and date columns).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdprocessor.pdprocessor import PDProcessor, CSVPDProcessor, ExcelPDProcessor  # noqa
+
+
+def generate_dataframe(rows, width=0, cardinality=100, seed=0):
+    """Return a synthetic source dataframe.
+
+    rows: the number of rows
+    width: the number of extra float columns not used by the data_map
+    cardinality: the number of distinct regions and dates
+    """
+
+    random = np.random.RandomState(seed)
+    regions = np.array(['region{0}'.format(i) for i in range(cardinality)], dtype=object)
+    start = dt.date(2000, 1, 1)
+    dates = np.array([(start + dt.timedelta(days=i)).strftime('%m/%d/%Y')
+                      for i in range(cardinality)], dtype=object)
+    data = {
+        'OrderDate': dates[random.randint(0, cardinality, rows)],
+        'Region': regions[random.randint(0, cardinality, rows)],
+        'Units': random.randint(0, 1000, rows),
+        'Unit Cost': random.random_sample(rows) * 100,
+    }
+    columns = ['OrderDate', 'Region', 'Units', 'Unit Cost']
+    for i in range(width):
+        col = 'Extra{0}'.format(i)
+        data[col] = random.random_sample(rows)
+        columns.append(col)
+    return pd.DataFrame(data, columns=columns)
+
+
+def generate_csv(path, rows, width=0, cardinality=100):
+    """Write a synthetic csv file to path."""
+
+    generate_dataframe(rows, width, cardinality).to_csv(path, index=False)
+
+
+def generate_excel(path, rows, width=0, cardinality=100):
+    """Write a synthetic xlsx file to path."""
+
+    generate_dataframe(rows, width, cardinality).to_excel(path, index=False)
+
+
+DATA_MAP = [
+    ('Date', 'OrderDate', 'format_date'),
+    ('Region', 'Region', 'format_uppercase'),
+    ('Qty', 'Units', None),
+    ('Cost', 'Unit Cost', None),
+]
+
+
+class BenchCSVPDProcessor(CSVPDProcessor):
+
+    data_map = DATA_MAP
+
+
+class BenchExcelPDProcessor(ExcelPDProcessor):
+
+    data_map = DATA_MAP
+
+
+class BenchStreamExcelPDProcessor(ExcelPDProcessor):
+
+    data_map = DATA_MAP
+    engine = 'stream'
+
+
+def bench_format_date(df):
+    processor = PDProcessor('path')
+    processor.format_date_column(df['OrderDate'])
+
+
+def bench_format_uppercase(df):
+    processor = PDProcessor('path')
+    processor.format_uppercase_column(df['Region'])
+
+
+def bench_format_dataframe(df):
+    processor = PDProcessor('path')
+    processor.data_map = DATA_MAP
+    processor.init_data_map()
+    processor.df = df
+    processor.format_dataframe()
+
+
+class BenchLegacyPDProcessor(PDProcessor):
+    """Formatters without column formatters, applied to each value."""
+
+    data_map = [
+        ('Region', 'Region', 'format_strip'),
+        ('Upper', 'Region', ['format_strip', 'format_upper']),
+        ('Lower', 'Region', ['format_strip', 'format_lower']),
+    ]
+
+    def format_strip(self, data):
+        return data.strip()
+
+    def format_upper(self, data):
+        return data.upper()
+
+    def format_lower(self, data):
+        return data.lower()
+
+
+def bench_format_legacy(df):
+    processor = BenchLegacyPDProcessor('path')
+    processor.init_data_map()
+    processor.df = df
+    processor.format_dataframe()
+
+
+def bench_apply_legacy(df):
+    """The same formatting as bench_format_legacy with Series.apply."""
+
+    processor = BenchLegacyPDProcessor('path')
+    stripped = df['Region'].apply(processor.format_strip)
+    stripped.apply(processor.format_upper)
+    stripped.apply(processor.format_lower)
+
+
+def bench_csv_create_dataframe(path):
+    processor = BenchCSVPDProcessor(path)
+    processor.init_data_map()
+    processor.create_dataframe()
+
+
+def bench_csv_process(path):
+    BenchCSVPDProcessor(path).process()
+
+
+def bench_excel_create_dataframe(path):
+    processor = BenchExcelPDProcessor(path)
+    processor.init_data_map()
+    processor.create_dataframe()
+
+
+def bench_excel_stream_create_dataframe(path):
+    processor = BenchStreamExcelPDProcessor(path)
+    processor.init_data_map()
+    processor.create_dataframe()
+
+
+def get_scenarios(directory, rows, width, cardinality, excel_rows):
+    """Return a list of (name, function, argument, rows) scenarios."""
+
+    df = generate_dataframe(rows, width, cardinality)
+    csv_path = os.path.join(directory, 'bench.csv')
+    df.to_csv(csv_path, index=False)
+    scenarios = [
+        ('format_date', bench_format_date, df, rows),
+        ('format_uppercase', bench_format_uppercase, df, rows),
+        ('format_dataframe', bench_format_dataframe, df, rows),
+        ('format_legacy', bench_format_legacy, df, rows),
+        ('apply_legacy', bench_apply_legacy, df, rows),
+        ('csv.create_dataframe', bench_csv_create_dataframe, csv_path, rows),
+        ('csv.process', bench_csv_process, csv_path, rows),
+    ]
+    if excel_rows:
+        excel_path = os.path.join(directory, 'bench.xlsx')
+        generate_excel(excel_path, excel_rows, width, cardinality)
+        scenarios.append(('excel.create_dataframe', bench_excel_create_dataframe,
+                          excel_path, excel_rows))
+        scenarios.append(('excel.stream.create_dataframe', bench_excel_stream_create_dataframe,
+                          excel_path, excel_rows))
+    return scenarios
+
+
+def run_scenario(function, argument, repeat):
+    """Return the best wall time of repeat calls of function(argument)."""
+
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        function(argument.copy() if isinstance(argument, pd.DataFrame) else argument)
+        times.append(time.time() - start)
+    return min(times)
+
+
+def run(rows, width, cardinality, excel_rows, repeat, only=None):
+    """Run the scenarios and return a dict of results by scenario name."""
+
+    directory = tempfile.mkdtemp()
+    try:
+        results = {}
+        for name, function, argument, scenario_rows in get_scenarios(
+                directory, rows, width, cardinality, excel_rows):
+            if only and name not in only:
+                continue
+            seconds = run_scenario(function, argument, repeat)
+            results[name] = {
+                'seconds': seconds,
+                'rows': scenario_rows,
+                'width': width,
+                'cardinality': cardinality,
+            }
+            print('{name:<24} {seconds:10.4f}s'.format(name=name, seconds=seconds))
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of messages for scenarios slower than the baseline."""
+
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        expected = baseline[name]['seconds']
+        if result['seconds'] > expected * (1 + tolerance):
+            message = '{name}: {seconds:.4f}s is slower than the baseline {expected:.4f}s'
+            regressions.append(message.format(name=name, seconds=result['seconds'],
+                                              expected=expected))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the pdprocessor pipeline.')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--width', type=int, default=20)
+    parser.add_argument('--cardinality', type=int, default=1000)
+    parser.add_argument('--excel-rows', type=int, default=20000,
+                        help='rows of the excel scenario, 0 to skip it')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scenario', action='append', dest='scenarios',
+                        help='run only this scenario, may be repeated')
+    parser.add_argument('--output', help='write the results as json to this file')
+    parser.add_argument('--baseline', help='compare the results to this json file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown relative to the baseline')
+    args = parser.parse_args(argv)
+
+    results = run(args.rows, args.width, args.cardinality, args.excel_rows,
+                  args.repeat, args.scenarios)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print('REGRESSION ' + message)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,8 @@
 __author__ = 'Jason Job'
 __email__ = 'jasonwadejob@gmail.com'
 __version__ = '0.1.0'
+
+# pandas is imported when it is first used, not by importing the package
+from .pdprocessor import (PDProcessorError, PDProcessor, ExcelPDProcessor,  # noqa
+                          WorkbookPDProcessor, CSVPDProcessor, DataMapPlan, Path,
+                          column_formatter)
@@ -0,0 +1,51 @@
+"""Asyncio support, process PDProcessors without blocking the event loop.
+
+Requires Python 3.5 or later. The stages run one at a time in an executor,
+a thread pool by default. The processor is mutated by the stages, so the
+executor must run them in this process (a ThreadPoolExecutor, not a
+ProcessPoolExecutor). Cancelling the task stops the run before the next
+stage, a running stage is not interrupted.
+"""
+import asyncio
+from .instrument import stop_tracing
+
+
+async def process_async(processor, executor=None, limiter=None):
+    """Run the stages of processor.process in executor.
+
+    Like process, the result is loaded from the result_cache of processor
+    when it is cached and stored in it otherwise.
+
+    executor: a concurrent.futures executor, None for the loop's default
+    limiter: an asyncio.Semaphore held while processing or None
+    """
+
+    if limiter is not None:
+        async with limiter:
+            return await process_async(processor, executor)
+    loop = asyncio.get_event_loop()
+    if processor.result_cache is not None:
+        key, loaded = await loop.run_in_executor(executor, processor.load_result)
+        if loaded:
+            return processor
+    started = processor.start_report()
+    try:
+        for stage in processor.stages:
+            await loop.run_in_executor(executor, processor.run_stage, stage)
+    finally:
+        stop_tracing(started)
+    if processor.result_cache is not None:
+        await loop.run_in_executor(executor, processor.result_cache.put, key, processor.df)
+    return processor
+
+
+async def process_many(processors, max_concurrency=4, executor=None):
+    """Process processors concurrently, at most max_concurrency at a time.
+
+    Return the list of results in the order of processors, a result is the
+    processor or the exception it raised.
+    """
+
+    limiter = asyncio.Semaphore(max_concurrency)
+    tasks = [process_async(processor, executor, limiter) for processor in processors]
+    return await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,164 @@
+"""Process many files with a PDProcessor class across a process pool.
+
+The processor class must be importable by the worker processes, that is
+defined at the top level of a module, and configured with class attributes.
+"""
+import os
+import functools
+import multiprocessing
+from .lazy import pd
+from .pdprocessor import PDProcessorError
+from .sinks import get_sink
+
+
+class BatchResult(object):
+    """The result of processing one file.
+
+    path: the path of the processed file
+    df: the processed dataframe, None if there is an error or the dataframe
+      was written to output_path
+    error: the PDProcessorError raised while processing the file or None
+    output_path: the path the dataframe was written to or None
+    attempts: the number of times the file was processed
+    """
+
+    def __init__(self, path, df=None, error=None, output_path=None, attempts=1):
+        self.path = path
+        self.df = df
+        self.error = error
+        self.output_path = output_path
+        self.attempts = attempts
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def retryable(self):
+        """True if the file failed with an unexpected error, which may be transient."""
+
+        return self.error is not None and self.error.cause is not None
+
+    def to_dict(self):
+        """Return the result without df as a dict of json serializable values."""
+
+        error = None if self.error is None else self.error.to_dict()
+        return {'path': self.path, 'error': error, 'output_path': self.output_path,
+                'attempts': self.attempts}
+
+    @classmethod
+    def from_dict(cls, record):
+        """Return the result of a dict returned by to_dict."""
+
+        error = record.get('error')
+        if error is not None:
+            error = PDProcessorError.from_dict(error)
+        return cls(record['path'], error=error, output_path=record.get('output_path'),
+                   attempts=record.get('attempts', 1))
+
+
+def get_output_path(path, output_dir, output_format):
+    """Return the path in output_dir for the processed file at path."""
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir, '{name}.{ext}'.format(name=name, ext=output_format))
+
+
+def check_output_paths(paths, output_dir, output_format):
+    """Raise a PDProcessorError if two of paths would write the same output file."""
+
+    sources = {}
+    for path in paths:
+        output_path = get_output_path(path, output_dir, output_format)
+        other = sources.setdefault(output_path, path)
+        if other != path:
+            message = "'{other}' and '{path}' would both be written to '{output_path}'.".format(
+                other=other, path=path, output_path=output_path)
+            raise PDProcessorError(message)
+
+
+def write_dataframe(df, path, output_format):
+    """Write df to path as 'parquet', 'feather' or 'csv'."""
+
+    with get_sink(output_format, path) as sink:
+        sink.write(df)
+
+
+def process_file(processor_class, path, output_dir=None, output_format='parquet',
+                 config=None):
+    """Process the file at path with processor_class and return a BatchResult.
+
+    Errors are returned in the result instead of raised, errors other than
+    PDProcessorError are wrapped in a PDProcessorError with their class name
+    as cause.
+
+    config: a dict of attributes set on the processor before processing
+    """
+
+    try:
+        processor = processor_class(path)
+        for name, value in (config or {}).items():
+            setattr(processor, name, value)
+        processor.process()
+        if output_dir is None:
+            return BatchResult(path, df=processor.df)
+        output_path = get_output_path(path, output_dir, output_format)
+        write_dataframe(processor.df, output_path, output_format)
+        return BatchResult(path, output_path=output_path)
+    except PDProcessorError as e:
+        if e.path is None:
+            e.path = path
+        return BatchResult(path, error=e)
+    except Exception as e:
+        message = "Failed to process '{path}': {error!r}".format(path=path, error=e)
+        return BatchResult(path, error=PDProcessorError(message, path, type(e).__name__))
+
+
+def process_batch(processor_class, paths, processes=None, chunksize=1,
+                  output_dir=None, output_format='parquet'):
+    """Process the files at paths with processor_class.
+
+    Return a list of BatchResult in the order of paths.
+
+    processes: the number of worker processes, None for the number of cpus,
+      1 to process the files in this process
+    chunksize: the number of paths sent to a worker at a time
+    output_dir: if set each dataframe is written to this directory by the
+      worker instead of being returned, as the file name with the extension
+      of output_format, files with the same name raise a PDProcessorError
+    output_format: 'parquet', 'feather' or 'csv'
+    """
+
+    if output_dir is not None:
+        check_output_paths(paths, output_dir, output_format)
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+    func = functools.partial(process_file, processor_class,
+                             output_dir=output_dir, output_format=output_format)
+    if processes == 1:
+        return [func(path) for path in paths]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(func, paths, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def concat_results(results, path_col=None):
+    """Concatenate the dataframes of the successful results.
+
+    path_col: if set, a column with this name holds the path of each file
+    """
+
+    dfs = []
+    for result in results:
+        if result.df is None:
+            continue
+        df = result.df
+        if path_col is not None:
+            df = df.assign(**{path_col: result.path})
+        dfs.append(df)
+    if not dfs:
+        return pd.DataFrame()
+    return pd.concat(dfs, ignore_index=True)
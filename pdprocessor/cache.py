@@ -0,0 +1,195 @@
+"""On-disk caches of dataframes.
+
+A DataFrameCache stores dataframes as Parquet files in a directory, keyed by
+a hash of the source file fingerprint and the options used to create them.
+The least recently used files are evicted when the directory grows past
+max_size bytes, and files not used for max_age seconds are evicted. Parquet
+support requires pyarrow or fastparquet.
+"""
+import os
+import time
+import inspect
+import hashlib
+import tempfile
+from .lazy import pd
+
+
+def file_fingerprint(path, hash_contents=True):
+    """Return a string identifying the contents of the file at path.
+
+    hash_contents: if True the sha1 of the file contents, otherwise the size
+    and modification time of the file
+    """
+
+    if not hash_contents:
+        stat = os.stat(path)
+        return '{size}-{mtime!r}'.format(size=stat.st_size, mtime=stat.st_mtime)
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _code_repr(code):
+    """Return a repr of a code object from its bytecode, constants and names."""
+
+    consts = ', '.join(_code_repr(const) if inspect.iscode(const) else repr(const)
+                       for const in code.co_consts)
+    return '{0}:{1}:[{2}]:{3!r}'.format(code.co_name, hashlib.sha1(code.co_code).hexdigest(),
+                                        consts, code.co_names)
+
+
+def _key_repr(value, seen=()):
+    """Return a repr of value that is stable between processes.
+
+    Functions are identified by their code, defaults and closure, so two
+    lambdas differ when their code or captured values differ.
+    """
+
+    if id(value) in seen:
+        return '...'
+    seen = seen + (id(value),)
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda item: repr(item[0]))
+        return '{' + ', '.join('{0!r}: {1}'.format(k, _key_repr(v, seen))
+                               for k, v in items) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_key_repr(v, seen) for v in value) + ']'
+    if inspect.ismethod(value):
+        return '{0}.{1}'.format(type(value.__self__).__name__, _key_repr(value.__func__, seen))
+    if inspect.isfunction(value):
+        closure = [cell.cell_contents for cell in value.__closure__ or ()]
+        return '{0}.{1}({2}, {3}, {4})'.format(value.__module__, value.__name__,
+                                               _code_repr(value.__code__),
+                                               _key_repr(list(value.__defaults__ or ()), seen),
+                                               _key_repr(closure, seen))
+    if callable(value) and hasattr(value, '__name__'):
+        return '{0}.{1}'.format(getattr(value, '__module__', None), value.__name__)
+    return repr(value)
+
+
+_class_sources = {}
+
+
+def class_fingerprint(cls):
+    """Return the sha1 of the source of cls and its base classes.
+
+    Classes without source, for example defined interactively, are
+    identified by their name.
+    """
+
+    fingerprint = _class_sources.get(cls)
+    if fingerprint is None:
+        sha1 = hashlib.sha1()
+        for base in inspect.getmro(cls):
+            if base is object:
+                continue
+            try:
+                source = inspect.getsource(base)
+            except (IOError, OSError, TypeError):
+                source = '{0}.{1}'.format(base.__module__, base.__name__)
+            sha1.update(source.encode('utf-8'))
+        fingerprint = _class_sources[cls] = sha1.hexdigest()
+    return fingerprint
+
+
+class DataFrameCache(object):
+    """A size bounded LRU cache of dataframes stored as Parquet files.
+
+    directory: the cache directory, created if it does not exist
+    max_size: the maximum total size of the cache files in bytes
+    hash_contents: if True source files are identified by the sha1 of their
+      contents, otherwise by their size and modification time
+    max_age: files not used for more than max_age seconds are evicted, None
+      for no maximum
+    """
+
+    suffix = '.parquet'
+
+    def __init__(self, directory, max_size=1 << 30, hash_contents=True, max_age=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.hash_contents = hash_contents
+        self.max_age = max_age
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def make_key(self, path, *parts):
+        """Return the key for the file at path and parts."""
+
+        sha1 = hashlib.sha1()
+        sha1.update(file_fingerprint(path, self.hash_contents).encode('utf-8'))
+        sha1.update(pd.__version__.encode('utf-8'))
+        for part in parts:
+            sha1.update(_key_repr(part).encode('utf-8'))
+        return sha1.hexdigest()
+
+    def get_path(self, key):
+        """Return the path of the cache file for key."""
+
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Return the dataframe stored for key or None."""
+
+        path = self.get_path(key)
+        try:
+            if self.max_age is not None and time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                return None
+            df = pd.read_parquet(path)
+        except (IOError, OSError):
+            return None
+        os.utime(path, None)
+        return df
+
+    def put(self, key, df):
+        """Store df for key and evict the least recently used files.
+
+        Return False if df can not be stored as Parquet.
+        """
+
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        try:
+            df.to_parquet(tmp_path)
+        except Exception:
+            os.remove(tmp_path)
+            return False
+        os.rename(tmp_path, self.get_path(key))
+        self.evict()
+        return True
+
+    def evict(self):
+        """Remove the files older than max_age and the least recently used
+        files until the cache fits max_size.
+        """
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        size = sum(entry[1] for entry in entries)
+        oldest = None if self.max_age is None else time.time() - self.max_age
+        for mtime, file_size, path in sorted(entries):
+            if size <= self.max_size and (oldest is None or mtime >= oldest):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= file_size
+
+    def clear(self):
+        """Remove all files from the cache."""
+
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,329 @@
+"""Run PDProcessors on a pluggable executor: threads, processes or a task queue.
+
+A run is described by a ProcessorSpec, the import path of the processor
+class, the path of the file and the attributes to set on the processor, so
+it can be sent to another process or host:
+
+    specs = [ProcessorSpec('feeds.processors:SalesProcessor', path) for path in paths]
+    results = run_specs(specs, ProcessExecutor(processes=8), retries=2)
+
+The results are BatchResults in the order of specs. A file failing with an
+unexpected error is retried up to retries times, a PDProcessorError raised
+by the processor is not retried. With a ProcessExecutor a worker process
+that dies, for example killed for running out of memory, fails the tasks
+it had not finished with a BrokenProcessPool cause, so they are retried on
+a new pool. A worker of a QueueExecutor that dies loses its task, the run
+then fails once the QueueExecutor timeout is reached.
+
+A QueueExecutor submits the specs to a broker and collects the results, the
+workers run run_worker on any host with access to the broker, the files and
+the output_dir. LocalBroker is an in-process broker with worker threads to
+run and test task queue runs on one host.
+"""
+import os
+import json
+import uuid
+import importlib
+import threading
+from multiprocessing.pool import ThreadPool
+from .pdprocessor import PDProcessorError
+from .batch import BatchResult, process_file, check_output_paths
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class ProcessorSpec(object):
+    """A serializable description of a processor run.
+
+    class_path: the processor class as '<module>:<class name>'
+    path: the path of the file to process
+    config: a dict of attributes set on the processor, json serializable to
+      be sent to a task queue
+    """
+
+    def __init__(self, class_path, path, config=None):
+        self.class_path = class_path
+        self.path = path
+        self.config = config or {}
+
+    def __repr__(self):
+        return 'ProcessorSpec({class_path!r}, {path!r})'.format(class_path=self.class_path,
+                                                                path=self.path)
+
+    @classmethod
+    def from_processor(cls, processor):
+        """Return the spec of processor, with the configuration set on the instance."""
+
+        processor_class = type(processor)
+        class_path = '{module}:{name}'.format(module=processor_class.__module__,
+                                              name=processor_class.__name__)
+        instance = vars(processor)
+        config = dict((name, value) for name, value in processor.get_config().items()
+                      if name in instance)
+        return cls(class_path, processor.path, config)
+
+    def get_class(self):
+        """Return the processor class of class_path."""
+
+        module_name, _, name = self.class_path.partition(':')
+        try:
+            return getattr(importlib.import_module(module_name), name)
+        except (ImportError, AttributeError):
+            message = "Processor class '{class_path}' can not be imported.".format(
+                class_path=self.class_path)
+            raise PDProcessorError(message, self.path)
+
+    def to_dict(self):
+        return {'class_path': self.class_path, 'path': self.path, 'config': self.config}
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record['class_path'], record['path'], record.get('config'))
+
+
+def run_task(task):
+    """Run a task and return its BatchResult.
+
+    task: a dict of the spec dict, output_dir and output_format
+    """
+
+    spec = ProcessorSpec.from_dict(task['spec'])
+    try:
+        processor_class = spec.get_class()
+    except PDProcessorError as e:
+        return BatchResult(spec.path, error=e)
+    return process_file(processor_class, spec.path, task.get('output_dir'),
+                        task.get('output_format', 'parquet'), spec.config)
+
+
+def failed_task(task, error):
+    """Return the BatchResult of a task that failed with the unexpected error."""
+
+    path = task.get('spec', {}).get('path')
+    message = "Failed to process '{path}': {error!r}".format(path=path, error=error)
+    return BatchResult(path, error=PDProcessorError(message, path, type(error).__name__))
+
+
+class Executor(object):
+    """Base class for executors running tasks.
+
+    Executors are context managers, close releases their workers.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def run(self, tasks):
+        """Run tasks and return their BatchResults in the order of tasks."""
+
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ThreadExecutor(Executor):
+    """Run tasks in threads of this process.
+
+    threads: the number of threads
+    """
+
+    def __init__(self, threads=4):
+        self.pool = ThreadPool(threads)
+
+    def run(self, tasks):
+        return self.pool.map(run_task, tasks)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+class ProcessExecutor(Executor):
+    """Run tasks in a pool of local processes.
+
+    When a worker process dies the tasks not finished fail with a
+    BrokenProcessPool cause and the next run starts a new pool.
+
+    processes: the number of processes, None for the number of cpus
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self.pool = None
+
+    def run(self, tasks):
+        from concurrent.futures import ProcessPoolExecutor
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.processes)
+        futures = [self.pool.submit(run_task, task) for task in tasks]
+        results = []
+        broken = False
+        for task, future in zip(tasks, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                broken = True
+                results.append(failed_task(task, e))
+        if broken:
+            self.close()
+        return results
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+class QueueExecutor(Executor):
+    """Run tasks on workers reading a task queue.
+
+    The tasks and results go through broker as json serializable dicts, so
+    results carry no dataframe, run_specs requires an output_dir readable by
+    the caller.
+
+    broker: the broker, an object with the methods of LocalBroker
+    timeout: the seconds to wait for each result, None to wait forever
+    """
+
+    requires_output_dir = True
+
+    def __init__(self, broker, timeout=None):
+        self.broker = broker
+        self.timeout = timeout
+
+    def run(self, tasks):
+        ids = {}
+        for i, task in enumerate(tasks):
+            task_id = uuid.uuid4().hex
+            ids[task_id] = i
+            self.broker.put_task(task_id, task)
+        results = [None] * len(tasks)
+        while ids:
+            item = self.broker.get_result(self.timeout)
+            if item is None:
+                message = 'Timed out waiting for {count} results.'.format(count=len(ids))
+                raise PDProcessorError(message)
+            task_id, result = item
+            if task_id in ids:
+                results[ids.pop(task_id)] = BatchResult.from_dict(result)
+        return results
+
+
+def run_worker(broker, timeout=None):
+    """Run the tasks of broker and return the number of tasks run.
+
+    The worker stops when broker has no task for timeout seconds or sends a
+    stop message. A task failing with an unexpected error, for example a
+    spec that can not be read, gets a failed BatchResult.
+    """
+
+    count = 0
+    while True:
+        item = broker.get_task(timeout)
+        if item is None:
+            return count
+        task_id, task = item
+        try:
+            result = run_task(task)
+        except Exception as e:
+            result = failed_task(task, e)
+        broker.put_result(task_id, result.to_dict())
+        count += 1
+
+
+class LocalBroker(object):
+    """An in-process stand-in for a task queue broker.
+
+    Messages are json encoded like a network broker would, so tasks that can
+    not be sent to remote workers fail here too.
+    """
+
+    def __init__(self):
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.threads = []
+
+    def put_task(self, task_id, task):
+        self.tasks.put(json.dumps([task_id, task]))
+
+    def get_task(self, timeout=None):
+        """Return the next (task_id, task) or None on timeout or stop."""
+
+        try:
+            message = self.tasks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if message is None:
+            return None
+        return tuple(json.loads(message))
+
+    def put_result(self, task_id, result):
+        self.results.put(json.dumps([task_id, result]))
+
+    def get_result(self, timeout=None):
+        """Return the next (task_id, result) or None on timeout."""
+
+        try:
+            return tuple(json.loads(self.results.get(timeout=timeout)))
+        except queue.Empty:
+            return None
+
+    def start_workers(self, count):
+        """Start count worker threads running run_worker."""
+
+        for i in range(count):
+            thread = threading.Thread(target=run_worker, args=(self,))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop_workers(self):
+        """Stop the worker threads once the queued tasks are done."""
+
+        for thread in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+def run_specs(specs, executor, retries=0, output_dir=None, output_format='parquet'):
+    """Process specs with executor and return their BatchResults in order.
+
+    Files failing with an unexpected error are run again up to retries
+    times, the attempts of each result count the runs.
+
+    output_dir: if set each dataframe is written to this directory by the
+      worker instead of being returned, see process_batch
+    output_format: 'parquet', 'feather' or 'csv'
+    """
+
+    if output_dir is None and getattr(executor, 'requires_output_dir', False):
+        message = '{executor} requires output_dir.'.format(executor=type(executor).__name__)
+        raise PDProcessorError(message)
+    if output_dir is not None:
+        check_output_paths([spec.path for spec in specs], output_dir, output_format)
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+    results = [None] * len(specs)
+    pending = list(range(len(specs)))
+    attempts = 0
+    while pending:
+        attempts += 1
+        tasks = [{'spec': specs[i].to_dict(), 'output_dir': output_dir,
+                  'output_format': output_format} for i in pending]
+        for i, result in zip(pending, executor.run(tasks)):
+            result.attempts = attempts
+            results[i] = result
+        if attempts > retries:
+            break
+        pending = [i for i in pending if results[i].retryable]
+    return results
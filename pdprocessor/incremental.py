@@ -0,0 +1,97 @@
+"""State of the incremental processing of append-only source files.
+
+An IncrementalState records how much of a source file has been processed,
+a checksum of that prefix and the processed dataframe. The next run of
+process_incremental only processes what was appended after the prefix, or
+the whole file if the prefix changed.
+"""
+import os
+import json
+import hashlib
+from .lazy import pd
+
+
+class IncrementalState(object):
+    """The state of an incremental run.
+
+    offset: the processed prefix, in bytes for CSVPDProcessor and in rows
+      for other processors
+    checksum: the sha1 of the processed prefix
+    df: the processed dataframe
+    """
+
+    def __init__(self, offset, checksum, df):
+        self.offset = offset
+        self.checksum = checksum
+        self.df = df
+
+    def save(self, directory):
+        """Save the state to directory as state.json and result.parquet."""
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.df.to_parquet(os.path.join(directory, 'result.parquet'))
+        with open(os.path.join(directory, 'state.json'), 'w') as f:
+            json.dump({'offset': self.offset, 'checksum': self.checksum}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Return the state saved in directory or None."""
+
+        try:
+            with open(os.path.join(directory, 'state.json')) as f:
+                state = json.load(f)
+            df = pd.read_parquet(os.path.join(directory, 'result.parquet'))
+        except (IOError, OSError, ValueError):
+            return None
+        return cls(state['offset'], state['checksum'], df)
+
+
+def row_hashes(df):
+    """Return the uint64 hash of each row of df."""
+
+    return pd.util.hash_pandas_object(df, index=False).values
+
+
+def rows_checksum(hashes):
+    """Return the sha1 of the row hashes."""
+
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def complete_size(path):
+    """Return the size of the file up to and including its last newline."""
+
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        position = size
+        while position > 0:
+            start = max(position - (1 << 16), 0)
+            f.seek(start)
+            block = f.read(position - start)
+            index = block.rfind(b'\n')
+            if index != -1:
+                return start + index + 1
+            position = start
+    return 0
+
+
+def prefix_checksums(path, offsets):
+    """Return the sha1 of the first offset bytes of the file for each offset.
+
+    The file is read once, offsets must be in increasing order.
+    """
+
+    checksums = []
+    sha1 = hashlib.sha1()
+    position = 0
+    with open(path, 'rb') as f:
+        for offset in offsets:
+            while position < offset:
+                block = f.read(min(1 << 20, offset - position))
+                if not block:
+                    break
+                sha1.update(block)
+                position += len(block)
+            checksums.append(sha1.hexdigest())
+    return checksums
@@ -0,0 +1,129 @@
+"""Timing and memory instrumentation of PDProcessor stages.
+
+Memory is measured with tracemalloc when it is tracing, otherwise the
+memory fields of a StageRecord are None. tracemalloc hooks every allocation
+and slows processing several times, so processors only start it when
+instrument is 'memory'. It traces the whole process, so when processors run
+concurrently in threads the memory of a record includes the allocations of
+the other threads.
+"""
+import time
+import threading
+from collections import namedtuple
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class StageRecord(namedtuple('StageRecord', ['name', 'seconds', 'rows_in', 'rows_out',
+                                             'memory_delta', 'memory_peak'])):
+    """The measurements of a stage.
+
+    name: the stage name, formatter columns are named 'format_dataframe:<final_col>'
+    seconds: the wall time of the stage
+    rows_in: the rows of the dataframe before the stage or None
+    rows_out: the rows of the dataframe after the stage or None
+    memory_delta: the bytes allocated and not released by the stage
+    memory_peak: the peak bytes allocated during the stage
+    """
+
+    __slots__ = ()
+
+
+def count_rows(processor):
+    """Return the number of rows of processor.df or None."""
+
+    df = getattr(processor, 'df', None)
+    if df is None:
+        return None
+    return len(df)
+
+
+_local = threading.local()
+
+
+def active_timers():
+    """Return the stack of the timers open in this thread."""
+
+    timers = getattr(_local, 'timers', None)
+    if timers is None:
+        timers = _local.timers = []
+    return timers
+
+
+class StageTimer(object):
+    """A context manager measuring a stage of processor.
+
+    The StageRecord is passed to processor.record_stage on exit. Timers may
+    be nested in a thread, the peak of an outer stage includes the peaks of
+    the stages nested in it.
+
+    memory: if False only the time and rows are recorded (default=True)
+    """
+
+    def __init__(self, processor, name, memory=True):
+        self.processor = processor
+        self.name = name
+        self.memory = memory
+
+    def __enter__(self):
+        self.rows_in = count_rows(self.processor)
+        self.memory_start = None
+        self.peak = 0
+        if self.memory and tracemalloc is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            for timer in active_timers():
+                timer.peak = max(timer.peak, peak)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.memory_start = current
+        active_timers().append(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.time() - self.start
+        active_timers().remove(self)
+        memory_delta = memory_peak = None
+        if self.memory_start is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self.peak, peak)
+            for timer in active_timers():
+                timer.peak = max(timer.peak, peak)
+            memory_delta = current - self.memory_start
+            memory_peak = max(peak - self.memory_start, 0)
+        record = StageRecord(self.name, seconds, self.rows_in,
+                             count_rows(self.processor), memory_delta, memory_peak)
+        self.processor.record_stage(record)
+        return False
+
+
+class NullTimer(object):
+    """A context manager measuring nothing, used when instrument is not set."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+def start_tracing():
+    """Start tracemalloc if it is not tracing, return True if it was started."""
+
+    if tracemalloc is None or tracemalloc.is_tracing():
+        return False
+    tracemalloc.start()
+    return True
+
+
+def stop_tracing(started):
+    """Stop tracemalloc if it was started by start_tracing."""
+
+    if started:
+        tracemalloc.stop()
@@ -0,0 +1,30 @@
+"""Deferred imports of heavy dependencies.
+
+pandas is imported the first time an attribute of the lazy module is used,
+so importing pdprocessor to validate a path or inspect a data_map does not
+pay for it.
+"""
+import importlib
+
+
+class LazyModule(object):
+    """A module imported on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return 'LazyModule({name!r})'.format(name=self.__dict__['_name'])
+
+
+pd = LazyModule('pandas')
+ptypes = LazyModule('pandas.api.types')
+np = LazyModule('numpy')
@@ -1,12 +1,241 @@
+import io
 import os
-import pandas as pd
+import inspect
+import weakref
+import random
 import datetime as dt
+from collections import namedtuple, OrderedDict
+from .lazy import pd, ptypes
+from .instrument import StageTimer, NULL_TIMER, start_tracing, stop_tracing
+from .shared import SharedFrame
+from .schema import Schema
+from .cache import class_fingerprint
+from .incremental import (IncrementalState, row_hashes, rows_checksum, complete_size,
+                          prefix_checksums)
+
+# the ExcelPDProcessor engine reading xlsx files with pdprocessor.xlsx
+STREAM_ENGINE = 'stream'
+
+
+def concat_no_copy():
+    """Return the pd.concat keyword arguments to concatenate without copying.
+
+    pandas 3 never copies in concat and deprecates its copy keyword.
+    """
+
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return {}
+    return {'copy': False}
+
+
+def column_formatter(name, validator=None):
+    """Declare the column formatter for a formatter.
+
+    A column formatter takes and returns a whole column (a pd.Series) and is
+    used by format_dataframe in place of applying the formatter to each value.
+    Formatters without a column formatter are applied with Series.apply.
+
+    name: name of the column formatter method on the PDProcessor
+    validator: name of the column validator method on the PDProcessor, it
+      takes a column and returns a boolean pd.Series that is True for the
+      values the formatter can not format, used by quarantine_rows
+    """
+
+    def decorator(formatter):
+        formatter.column_formatter = name
+        formatter.column_validator = validator
+        return formatter
+    return decorator
+
+
+class ColumnSelector(object):
+    """A usecols callable selecting columns by name."""
+
+    def __init__(self, cols):
+        self.cols = frozenset(cols)
+
+    def __call__(self, col):
+        return col in self.cols
+
+    def __repr__(self):
+        return 'ColumnSelector({cols!r})'.format(cols=sorted(self.cols, key=str))
+
 
 class PDProcessorError(Exception):
-    """A PDProcessor Error."""
+    """A PDProcessor Error.
+
+    path: the path of the file being processed or None
+    cause: the class name of the unexpected error wrapped in this error or None
+    """
 
-    def __init__(self, message):
+    def __init__(self, message, path=None, cause=None):
         self.message = message
+        self.path = path
+        self.cause = cause
+
+    def to_dict(self):
+        """Return the error as a dict of json serializable values."""
+
+        return {'message': self.message, 'path': self.path, 'cause': self.cause}
+
+    @classmethod
+    def from_dict(cls, record):
+        """Return the error of a dict returned by to_dict."""
+
+        return cls(record['message'], record.get('path'), record.get('cause'))
+
+
+class FormatterChain(namedtuple('FormatterChain', ['names', 'formatters'])):
+    """Formatters applied in order, each to the output of the previous one.
+
+    Formatters with a column formatter are applied to the whole column,
+    consecutive formatters without one are fused into one function applied
+    to each value, see SourceScan.
+    """
+
+    __slots__ = ()
+
+
+PlanEntry = namedtuple('PlanEntry', ['final_col', 'source_col', 'formatter_name',
+                                     'formatter', 'source_index', 'dtype'])
+
+
+class DataMapPlan(namedtuple('DataMapPlan', ['entries', 'source_cols', 'final_cols'])):
+    """A data_map compiled for a PDProcessor class.
+
+    A data_map is a list of (final_col, source_col, formatter) entries with an
+    optional fourth dtype the final column is converted to. formatter is a
+    formatter name, None, or a list of formatter names applied in order. The
+    plan holds a PlanEntry per entry with the formatter as defined on the
+    class, a FormatterChain for a list, and the index of source_col in
+    source_cols. source_cols are in the order they first appear in the
+    data_map.
+
+    Formatters are looked up on the processor by name when formatting, so
+    staticmethods and formatters set on an instance work, the formatter of a
+    PlanEntry is None for a formatter only set on instances.
+
+    Plans are immutable and hashable, get returns the plan shared by every
+    instance of a class with the same data_map. Plans are kept while their
+    class exists.
+    """
+
+    __slots__ = ()
+    _plans = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def get(cls, processor_class, data_map):
+        """Return the plan for data_map on processor_class, compiled once."""
+
+        plans = cls._plans.get(processor_class)
+        if plans is None:
+            plans = cls._plans[processor_class] = {}
+        key = tuple(tuple(tuple(value) if isinstance(value, list) else value
+                          for value in entry) for entry in data_map)
+        plan = plans.get(key)
+        if plan is None:
+            plan = plans[key] = cls.compile(processor_class, data_map)
+        return plan
+
+    @classmethod
+    def compile(cls, processor_class, data_map):
+        """Return a new plan for data_map on processor_class."""
+
+        entries = []
+        source_cols = []
+        for entry in data_map:
+            final_col, source_col, formatter_name = entry[:3]
+            dtype = entry[3] if len(entry) > 3 else None
+            if isinstance(formatter_name, (list, tuple)):
+                formatter_name = tuple(name or '_format_none' for name in formatter_name)
+                formatter = FormatterChain(formatter_name, tuple(
+                    cls.get_formatter(processor_class, name) for name in formatter_name))
+            else:
+                formatter_name = formatter_name or '_format_none'
+                formatter = cls.get_formatter(processor_class, formatter_name)
+            if source_col not in source_cols:
+                source_cols.append(source_col)
+            entries.append(PlanEntry(final_col, source_col, formatter_name, formatter,
+                                     source_cols.index(source_col), dtype))
+        final_cols = tuple(entry.final_col for entry in entries)
+        return cls(tuple(entries), tuple(source_cols), final_cols)
+
+    @staticmethod
+    def get_formatter(processor_class, formatter_name):
+        """Return the formatter named formatter_name as defined on processor_class or None.
+
+        The function of a staticmethod is returned, other attributes as they are.
+        """
+
+        for klass in inspect.getmro(processor_class):
+            if formatter_name in vars(klass):
+                formatter = vars(klass)[formatter_name]
+                if isinstance(formatter, (staticmethod, classmethod)):
+                    formatter = formatter.__func__
+                return formatter
+        return None
+
+
+class SourceScan(object):
+    """The formatting of a source column shared by its final columns.
+
+    Results are kept by formatter names, so a chain or a chain prefix used
+    by several final columns is formatted once. Consecutive formatters
+    without a column formatter are fused into one function applied to each
+    value, unless another chain needs the result between them.
+
+    processor: the PDProcessor formatting the column
+    column: the source column
+    chains: the FormatterChains of the final columns formatted from column
+    """
+
+    def __init__(self, processor, column, chains):
+        self.processor = processor
+        self.column = column
+        self.chains = chains
+        self.results = {}
+
+    def format(self, chain):
+        """Return column formatted with chain, from its longest formatted prefix."""
+
+        names = chain.names
+        start = len(names)
+        while start and names[:start] not in self.results:
+            start -= 1
+        column = self.results[names[:start]] if start else self.column
+        while start < len(names):
+            end = start + 1
+            formatter = self.processor.get_formatter(names[start])
+            if not getattr(formatter, 'column_formatter', None):
+                while end < len(names) and not self.is_shared(names[:end], chain):
+                    following = self.processor.get_formatter(names[end])
+                    if getattr(following, 'column_formatter', None):
+                        break
+                    end += 1
+                if end > start + 1:
+                    formatter = fuse_formatters([self.processor.get_formatter(name)
+                                                 for name in names[start:end]])
+            column = self.processor.format_column(column, formatter)
+            self.results[names[:end]] = column
+            start = end
+        return column
+
+    def is_shared(self, prefix, chain):
+        """Return True if a chain other than chain starts with the formatter names prefix."""
+
+        return any(other.names != chain.names and other.names[:len(prefix)] == prefix
+                   for other in self.chains)
+
+
+def fuse_formatters(formatters):
+    """Return a function applying formatters in order to a value."""
+
+    def formatter(data):
+        for function in formatters:
+            data = function(data)
+        return data
+    return formatter
+
 
 class Path(object):
     """A path class."""
@@ -14,49 +243,394 @@ class Path(object):
     def __init__(self, path_to_file):
         self.path = path_to_file
 
+    def validate_path(self):
+        """Validate the path point to a file."""
+
+        if not os.path.isfile(self.path):
+            message = "No file found at '{path}'.".format(path=self.path)
+            raise PDProcessorError(message)
+
 
 class PDProcessor(Path):
     """Base class for a pandas dataframe processor.
 
     A PDProcessor creates a dataframe from a delimited file such as csv or
     excel. The dataframe is manipulated by adding or formatting columns.
+
+    compact: if True format_dataframe converts the final columns to compact
+      dtypes with compact_dataframe (default=False)
+    category_cols: final columns always converted to category (default=None)
+    category_threshold: string columns with at most this ratio of distinct
+      values to rows are converted to category (default=0.5)
+    instrument: if True each stage and formatter column is timed and a
+      StageRecord is added to self.report, if 'memory' the memory of the
+      stages is also measured with tracemalloc, which traces every allocation
+      and makes processing several times slower (default=False)
+    quarantine: if True format_dataframe moves the rows with values the
+      formatters can not format to self.quarantined (default=False)
+    max_errors: the maximum number of quarantined rows, None for no
+      maximum (default=None)
+    schema_path: if set, the source columns are read with the dtypes of the
+      Schema saved at this path, which is inferred from a sample of the file
+      and saved on the first run (default=None)
+    schema_sample: the number of rows sampled to infer the schema (default=10000)
+    schema_blocks: the number of blocks the sample is read in, the first
+      block is the start of the file and the others are at random positions
+      (default=1)
+    on_schema_drift: 'raise' to raise a PDProcessorError when values do not
+      fit the schema, 'report' to add a SchemaDrift to self.schema_drift and
+      leave the column as read (default='raise')
+    result_cache: a pdprocessor.cache.DataFrameCache, if set process loads
+      self.df from it when the file and the configuration are unchanged
+      (default=None)
     """
 
     data_map = None
     date_format = '%m/%d/%Y'
+    source_cache = None
+    result_cache = None
+    compact = False
+    category_cols = None
+    category_threshold = 0.5
+    instrument = False
+    quarantine = False
+    max_errors = None
+    schema_path = None
+    schema_sample = 10000
+    schema_blocks = 1
+    on_schema_drift = 'raise'
+    stages = ('validate_path', 'init_data_map', 'validate_header', 'create_dataframe',
+              'validate_dataframe', 'preprocess', 'format_dataframe', 'postprocess')
 
     def process(self):
-        """Process the file."""
+        """Process the file.
+
+        With result_cache set, the result of a previous run on the same file
+        with the same configuration is loaded instead of processing the file.
+        Only self.df is cached, quarantined rows and schema drift are not.
+        """
+
+        if self.result_cache is None:
+            self.run_stages()
+            return
+        key, loaded = self.load_result()
+        if loaded:
+            return
+        self.run_stages()
+        self.result_cache.put(key, self.df)
+
+    def load_result(self):
+        """Load self.df from result_cache.
+
+        Return the result_cache key of the file and the configuration, and
+        True if self.df was loaded or False if the result is not cached.
+        """
 
         self.validate_path()
+        key = self.result_key()
+        df = self.result_cache.get(key)
+        if df is None:
+            return key, False
         self.init_data_map()
-        self.create_dataframe()
-        self.validate_dataframe()
-        self.preprocess()
-        self.format_dataframe()
-        self.postprocess()
+        self.df = df
+        return key, True
 
+    def run_stages(self):
+        """Run the stages of process."""
 
-    def validate_path(self):
-        """Validate the path point to a file."""
+        started = self.start_report()
+        try:
+            for stage in self.stages:
+                self.run_stage(stage)
+        finally:
+            stop_tracing(started)
 
-        if not os.path.isfile(self.path):
-            message = "No file found at '{path}'.".format(path=self.path)
-            raise PDProcessorError(message)
+    def run_stage(self, stage):
+        """Run the stage method named stage."""
+
+        with self.time_stage(stage):
+            getattr(self, stage)()
+
+    def time_stage(self, name):
+        """Return a context manager measuring the stage name when instrument is set."""
+
+        if self.instrument:
+            return StageTimer(self, name, memory=self.instrument == 'memory')
+        return NULL_TIMER
+
+    def start_report(self):
+        """Start a new self.report when instrument is set.
+
+        Return True if tracemalloc was started, to pass to stop_tracing.
+        """
+
+        if not self.instrument:
+            return False
+        self.report = []
+        if self.instrument == 'memory':
+            return start_tracing()
+        return False
+
+    def get_config(self):
+        """Return a dict of the configuration attributes of the processor.
+
+        These are the public attributes of the class, as overridden on the
+        instance, that are not methods or caches. Callables set as options,
+        such as a date_parser or a callable skiprows, are included.
+        """
+
+        config = {}
+        for klass in reversed(inspect.getmro(type(self))):
+            for name, value in vars(klass).items():
+                if name.startswith('_') or name in ('source_cache', 'result_cache'):
+                    continue
+                if inspect.isfunction(value) or isinstance(value, (classmethod, property)):
+                    config.pop(name, None)
+                else:
+                    config[name] = getattr(self, name)
+        return config
+
+    def result_key(self):
+        """Return the result_cache key of the file and the configuration.
+
+        The source of the class and its bases is part of the key, so editing
+        a formatter invalidates the cached results. Formatters of the
+        data_map set on the instance are part of the key too.
+        """
+
+        cls = type(self)
+        name = '{module}.{name}'.format(module=cls.__module__, name=cls.__name__)
+        formatters = set()
+        for entry in self.data_map or ():
+            formatter = entry[2]
+            formatters.update(formatter if isinstance(formatter, (list, tuple)) else [formatter])
+        instance = dict((attr, value) for attr, value in vars(self).items()
+                        if attr in formatters)
+        return self.result_cache.make_key(self.path, name, class_fingerprint(cls),
+                                          self.get_config(), instance)
+
+    def aprocess(self, executor=None, limiter=None):
+        """Return a coroutine processing the file without blocking the event loop.
+
+        The stages run in executor, see pdprocessor.aio.process_async.
+        Requires Python 3.5 or later.
+        """
+
+        from .aio import process_async
+        return process_async(self, executor, limiter)
+
+    def process_chunks(self, chunksize):
+        """Process the file in chunks of chunksize rows.
+
+        Yield each chunk after it is formatted. The dataframe is validated
+        once with the first chunk, preprocess, format_dataframe and
+        postprocess run on every chunk with the chunk as self.df.
+        """
+
+        started = self.start_report()
+        try:
+            for stage in ('validate_path', 'init_data_map', 'validate_header'):
+                self.run_stage(stage)
+            chunks = iter(self.create_dataframe_chunks(chunksize))
+            validated = False
+            while True:
+                with self.time_stage('create_dataframe'):
+                    df = next(chunks, None)
+                if df is None:
+                    break
+                self.df = df
+                if not validated:
+                    self.run_stage('validate_dataframe')
+                    validated = True
+                for stage in ('preprocess', 'format_dataframe', 'postprocess'):
+                    self.run_stage(stage)
+                yield self.df
+        finally:
+            stop_tracing(started)
+
+    def process_to_sink(self, sink, chunksize=None):
+        """Process the file and write the result to sink.
+
+        With chunksize the file is processed with process_chunks and each
+        chunk is written as soon as it is formatted, self.df is the last
+        chunk. The sink is not closed.
+
+        sink: a pdprocessor.sinks.Sink
+        """
+
+        if chunksize is None:
+            self.process()
+            sink.write(self.df)
+            return
+        for df in self.process_chunks(chunksize):
+            sink.write(df)
+
+    def publish(self, directory=None):
+        """Publish self.df for zero-copy use by other processes.
+
+        Return a pdprocessor.shared.SharedFrame handle, the caller removes
+        the published file with its unlink method.
+        """
+
+        return SharedFrame.publish(self.df, directory)
+
+    def process_incremental(self, state=None):
+        """Process the rows appended to the file since state.
+
+        Return the IncrementalState to pass to the next run, self.df is the
+        whole processed dataframe. The file is read again but only the new
+        rows are formatted and appended to state.df. If the rows processed
+        in state changed the whole file is processed.
+
+        state: the IncrementalState of the previous run or None
+        """
+
+        started = self.start_report()
+        try:
+            for stage in ('validate_path', 'init_data_map', 'validate_header',
+                          'create_dataframe', 'validate_dataframe'):
+                self.run_stage(stage)
+            hashes = row_hashes(self.df)
+            previous = None
+            if state is not None and state.offset <= len(hashes):
+                if rows_checksum(hashes[:state.offset]) == state.checksum:
+                    previous = state.df
+                    self.df = self.df.iloc[state.offset:].copy()
+            return self.append_increment(previous, len(hashes), rows_checksum(hashes))
+        finally:
+            stop_tracing(started)
+
+    def append_increment(self, previous, offset, checksum):
+        """Format the new rows in self.df and append them to previous.
+
+        Return the IncrementalState for offset and checksum.
+        """
+
+        for stage in ('preprocess', 'format_dataframe', 'postprocess'):
+            self.run_stage(stage)
+        if previous is not None:
+            self.df = pd.concat([previous, self.df], ignore_index=True)
+        return IncrementalState(offset, checksum, self.df)
 
     def set_date_format(self, format):
-        """Set the date format."""
+        """Set the date format.
+
+        format: a date format or a list of date formats tried in order
+        """
 
         self.date_format = format
 
+    def selects_source_cols(self):
+        """Return True if a reader may parse only the source_cols.
+
+        An index_col or a parse_dates list or dict refer to columns by name
+        or position, which may not be source_cols or would shift, so all
+        columns are parsed when they are set.
+        """
+
+        index_col = getattr(self, 'index_col', None)
+        parse_dates = getattr(self, 'parse_dates', False)
+        return ((index_col is None or index_col is False) and
+                (parse_dates is None or isinstance(parse_dates, bool)))
+
+    def get_date_formats(self):
+        """Return the list of date formats."""
+
+        if isinstance(self.date_format, (list, tuple)):
+            return list(self.date_format)
+        return [self.date_format]
+
     def create_dataframe(self):
         """Create a dataframe from the source file at self.path."""
 
         pass
 
+    def read_source(self, reader, **options):
+        """Return the dataframe read from self.path by reader with options.
+
+        When source_cache is set (a pdprocessor.cache.DataFrameCache) the
+        dataframe is loaded from the cache if the file and options are
+        unchanged, otherwise it is read and stored in the cache.
+        """
+
+        if self.source_cache is None:
+            return reader(self.path, **options)
+        key = self.source_cache.make_key(self.path, reader, options)
+        df = self.source_cache.get(key)
+        if df is None:
+            df = reader(self.path, **options)
+            self.source_cache.put(key, df)
+        return df
+
+    def lock_schema(self):
+        """Return the Schema of the source file.
+
+        The schema is loaded from schema_path, on the first run it is inferred
+        from read_sample and saved to schema_path.
+        """
+
+        if self.schema is None:
+            schema = Schema.load(self.schema_path)
+            if schema is None:
+                schema = Schema.infer(self.read_sample())
+                schema.save(self.schema_path)
+            self.schema = schema
+        return self.schema
+
+    def read_sample(self):
+        """Return a sample dataframe of the source file to infer the schema from.
+
+        Readers supporting schema_path override this.
+        """
+
+        message = '{cls} does not support schema_path.'.format(cls=type(self).__name__)
+        raise PDProcessorError(message)
+
+    def report_schema_drift(self, drift):
+        """Report a list of SchemaDrift according to on_schema_drift."""
+
+        if not drift:
+            return
+        if self.on_schema_drift == 'report':
+            self.schema_drift.extend(drift)
+            return
+        columns = '; '.join(
+            "column '{col}' does not fit {dtype} in {count} rows such as {example!r}".format(
+                col=item.column, count=item.count, dtype=item.dtype, example=item.example)
+            for item in drift)
+        message = "Schema drift in '{path}': {columns}.".format(path=self.path, columns=columns)
+        raise PDProcessorError(message)
+
+    def fit_schema(self, df):
+        """Return df, read with inferred dtypes, converted to the locked schema.
+
+        The drift is reported, the columns with drift are left as they are.
+        """
+
+        drift = self.lock_schema().find_drift(df)
+        self.report_schema_drift(drift)
+        return self.schema.apply(df, exclude=[item.column for item in drift])
+
+    def create_dataframe_chunks(self, chunksize):
+        """Yield dataframes of chunksize rows from the source file at self.path.
+
+        Subclasses that can read the source file incrementally override this,
+        by default the dataframe is created and then split into chunks.
+        """
+
+        if chunksize < 1:
+            message = 'chunksize must be a positive integer.'
+            raise PDProcessorError(message)
+        self.create_dataframe()
+        df = self.df
+        del self.df
+        for start in range(0, max(len(df), 1), chunksize):
+            yield df.iloc[start:start + chunksize].copy()
+
     def init_data_map(self):
         """Intialize the data_map.
 
+        Set plan - the DataMapPlan compiled from the data_map.
         Set source_cols - the expected column names from the source file.
         Set final_cols the final column names.
         """
@@ -64,58 +638,258 @@ class PDProcessor(Path):
         if not self.data_map:
             message = 'data_map is None.'
             raise PDProcessorError(message)
-        self.source_cols = list(set(
-            [source_col for (final_col, source_col, formatter) in self.data_map]))
-        self.final_cols = [final_col for (final_col, source_col, formatter) in
-                           self.data_map]
-        data_map = []
-        for final_col, source_col, formatter in self.data_map:
-            if not formatter:
-                formatter = '_format_none'
-            try:
-                data_map.append((final_col, source_col, getattr(self, formatter)))
-            except AttributeError:
-                message = "Formatter '{formatter}' is not defined.".format(formatter = formatter)
-                raise PDProcessorError(message)
-        self.data_map = data_map
+        self.plan = DataMapPlan.get(type(self), self.data_map)
+        for entry in self.plan.entries:
+            for name in self.get_chain(entry).names:
+                if not callable(getattr(self, name, None)):
+                    message = "Formatter '{formatter}' is not defined.".format(formatter=name)
+                    raise PDProcessorError(message)
+        self.source_cols = list(self.plan.source_cols)
+        self.final_cols = list(self.plan.final_cols)
+        self.quarantined = None
+        self.schema = None
+        self.schema_drift = []
+
+    def read_header(self):
+        """Return the column names from the header of the file.
+
+        Readers that can read the header without parsing the file override
+        this, by default None is returned and validate_header is skipped.
+        """
+
+        return None
+
+    def validate_header(self):
+        """Validate the header by verifying source_cols are in the header.
+
+        Only the header of the file is read, so a file with missing columns
+        is rejected before it is parsed.
+        """
+
+        header = self.read_header()
+        if header is not None:
+            self.validate_columns(header)
 
     def validate_dataframe(self):
         """Validate the dataframe by verifying source_col are in df.columns."""
 
-        source_cols = set(self.source_cols)
-        actual_cols = set(self.df.columns.tolist())
-        if source_cols <= actual_cols:
+        self.validate_columns(self.df.columns.tolist())
+
+    def validate_columns(self, columns):
+        """Verify source_cols are in columns, report all the missing columns."""
+
+        actual_cols = set(columns)
+        missing = [col for col in self.source_cols if col not in actual_cols]
+        if not missing:
             return
-        for col in source_cols:
-            if col not in actual_cols:
-                message = "Expected column '{col}' is not in the source file.".format(col=col)
-                raise PDProcessorError(message)
+        if len(missing) == 1:
+            message = "Expected column '{col}' is not in the source file.".format(col=missing[0])
+        else:
+            cols = ', '.join("'{col}'".format(col=col) for col in missing)
+            message = "Expected columns {cols} are not in the source file.".format(cols=cols)
+        raise PDProcessorError(message)
 
     def preprocess(self):
         """Provide preprocess steps."""
         pass
 
     def format_dataframe(self):
-        for final_col, source_col, formatter in self.data_map:
-            self.df[final_col] = self.df[source_col].apply(formatter)
-        self.df = self.df[self.final_cols]
+        """Replace the dataframe with the final columns of the data_map.
+
+        The dataframe is built from the formatted columns, columns without a
+        formatter are not copied. The final columns formatted from the same
+        source column share a SourceScan, which is released after the last of
+        them.
+        """
+
+        if self.quarantine:
+            self.quarantine_rows()
+        entries = self.plan.entries
+        last_use = dict((entry.source_col, i) for i, entry in enumerate(entries))
+        chains = {}
+        for entry in entries:
+            chains.setdefault(entry.source_col, []).append(self.get_chain(entry))
+        scans = dict((col, SourceScan(self, self.df[col], chains[col])) for col in last_use)
+        self.df = self.df[[]]
+        columns = []
+        for i, entry in enumerate(entries):
+            scan = scans[entry.source_col]
+            if last_use[entry.source_col] == i:
+                del scans[entry.source_col]
+            with self.time_stage('format_dataframe:' + str(entry.final_col)):
+                column = self.format_entry(entry, scan)
+            del scan
+            columns.append(column)
+            del column
+        self.df = pd.concat(columns, axis=1, keys=self.final_cols, **concat_no_copy())
+        if self.compact:
+            self.compact_dataframe()
+
+    def quarantine_rows(self):
+        """Move the rows with values the formatters can not format.
+
+        The rows are removed from self.df and appended to self.quarantined
+        with a reason column. Raise a PDProcessorError when more than
+        max_errors rows are quarantined.
+        """
+
+        reasons = pd.Series(None, index=self.df.index, dtype=object)
+        for entry in self.plan.entries:
+            # the first formatter of a chain formats the source values
+            formatter_name = self.get_chain(entry).names[0]
+            name = getattr(self.get_formatter(formatter_name), 'column_validator', None)
+            if not name:
+                continue
+            invalid = getattr(self, name)(self.df[entry.source_col])
+            invalid &= reasons.isnull()
+            if invalid.any():
+                reasons[invalid] = "Invalid value in column '{col}' for {formatter}.".format(
+                    col=entry.source_col, formatter=formatter_name)
+        bad = reasons.notnull()
+        if bad.any():
+            quarantined = self.df[bad].assign(reason=reasons[bad])
+            if self.quarantined is not None:
+                quarantined = pd.concat([self.quarantined, quarantined])
+            self.quarantined = quarantined
+            self.df = self.df[~bad]
+        errors = 0 if self.quarantined is None else len(self.quarantined)
+        if self.max_errors is not None and errors > self.max_errors:
+            message = '{errors} rows failed validation, the maximum is {max_errors}.'.format(
+                errors=errors, max_errors=self.max_errors)
+            raise PDProcessorError(message)
+
+    def format_entry(self, entry, column):
+        """Return the final column of a PlanEntry.
+
+        column: the source column or the SourceScan of the source column
+        """
+
+        if not isinstance(column, SourceScan):
+            column = SourceScan(self, column, [self.get_chain(entry)])
+        column = column.format(self.get_chain(entry))
+        if entry.dtype is not None:
+            column = column.astype(entry.dtype)
+        return column
+
+    def get_chain(self, entry):
+        """Return the formatter of a PlanEntry as a FormatterChain."""
+
+        if isinstance(entry.formatter, FormatterChain):
+            return entry.formatter
+        return FormatterChain((entry.formatter_name,), (entry.formatter,))
+
+    def get_formatter(self, name):
+        """Return the formatter name of the processor."""
+
+        return getattr(self, name)
+
+    def is_vectorized(self, chain):
+        """Return True if every formatter of the FormatterChain chain has a column formatter."""
+
+        return all(getattr(self.get_formatter(name), 'column_formatter', None)
+                   for name in chain.names)
+
+    def compact_dataframe(self):
+        """Convert the columns of the dataframe to compact dtypes.
+
+        Columns with a dtype in the data_map are left as is.
+        """
+
+        category_cols = set(self.category_cols or [])
+        dtypes = dict((entry.final_col, entry.dtype) for entry in self.plan.entries)
+        for col in self.df.columns:
+            if dtypes.get(col) is not None:
+                continue
+            self.df[col] = self.compact_column(self.df[col], col in category_cols)
+
+    def compact_column(self, column, category=False):
+        """Return column with a compact dtype.
+
+        Floats are downcast to float32, integers to the smallest integer
+        dtype, dates to datetime64 and strings with few distinct values
+        to category.
+        """
+
+        if category:
+            return column.astype('category')
+        if ptypes.is_float_dtype(column):
+            return pd.to_numeric(column, downcast='float')
+        if ptypes.is_integer_dtype(column):
+            return pd.to_numeric(column, downcast='integer')
+        if not (ptypes.is_object_dtype(column) or ptypes.is_string_dtype(column)):
+            return column
+        kind = ptypes.infer_dtype(column, skipna=True)
+        if kind == 'date':
+            return pd.to_datetime(column)
+        if kind in ('string', 'unicode') and len(column):
+            if column.nunique() <= self.category_threshold * len(column):
+                return column.astype('category')
+        return column
+
+    def format_column(self, column, formatter):
+        """Format column with formatter.
+
+        Use the column formatter declared for formatter if there is one,
+        otherwise apply formatter to each value in the column.
+        """
+
+        name = getattr(formatter, 'column_formatter', None)
+        if name:
+            return getattr(self, name)(column)
+        return column.apply(formatter)
 
     def postprocess(self):
         """Provide post process steps."""
         pass
 
+    def record_stage(self, record):
+        """Add the StageRecord of an instrumented stage to self.report.
+
+        Override to also export the record, for example to a metrics system.
+        """
+
+        if getattr(self, 'report', None) is None:
+            self.report = []
+        self.report.append(record)
+
     def set_final_cols(self):
         self.df = self.df[self.final_cols]
 
 
+    @column_formatter('_format_none_column')
     def _format_none(self, data):
         """Dummy formatter when formatter in self.data_map is None."""
 
         return data
 
+    def _format_none_column(self, column):
+        """Column formatter for _format_none, the column is not copied."""
+
+        return column
+
+    @column_formatter('format_uppercase_column', 'validate_uppercase_column')
     def format_uppercase(self, data):
         return data.upper()
 
+    def format_uppercase_column(self, column):
+        """Column formatter for format_uppercase.
+
+        A column with values that are not strings is formatted with
+        format_uppercase, which fails on them like it does for each value.
+        """
+
+        if self.validate_uppercase_column(column).any():
+            return column.apply(self.format_uppercase)
+        return column.str.upper()
+
+    def validate_uppercase_column(self, column):
+        """Column validator for format_uppercase, values must be strings."""
+
+        if not (ptypes.is_object_dtype(column) or ptypes.is_string_dtype(column)):
+            return column.notnull()
+        return column.notnull() & column.str.len().isnull()
+
+    @column_formatter('format_date_column', 'validate_date_column')
     def format_date(self, data):
         """Format date."""
 
@@ -123,9 +897,108 @@ class PDProcessor(Path):
             return data
         if isinstance(data, dt.datetime):
             return data.date()
-        date = dt.datetime.strptime(data, self.date_format).date()
+        date_formats = self.get_date_formats()
+        for date_format in date_formats[:-1]:
+            try:
+                return dt.datetime.strptime(data, date_format).date()
+            except ValueError:
+                pass
+        date = dt.datetime.strptime(data, date_formats[-1]).date()
         return date
 
+    def format_date_column(self, column):
+        """Column formatter for format_date.
+
+        Strings are parsed with parse_date_strings, other values are
+        formatted with format_date, which fails on values that are not dates.
+        """
+
+        if ptypes.is_datetime64_any_dtype(column):
+            return column.dt.date
+        kind = ptypes.infer_dtype(column, skipna=True)
+        if kind == 'date':
+            return column
+        if kind in ('string', 'unicode'):
+            return self.parse_date_strings(column)
+        if kind == 'datetime':
+            return pd.to_datetime(column).dt.date
+        if kind != 'mixed':
+            return column.apply(self.format_date)
+        is_string = column.str.len().notnull()
+        dates = self.parse_date_strings(column.where(is_string))
+        others = column[~is_string & column.notnull()].apply(self.format_date)
+        return dates.where(is_string, others)
+
+    def validate_date_column(self, column):
+        """Column validator for format_date.
+
+        Values must be dates, datetimes or strings matching a date format.
+        """
+
+        if ptypes.is_datetime64_any_dtype(column):
+            return pd.Series(False, index=column.index)
+        kind = ptypes.infer_dtype(column, skipna=True)
+        if kind in ('date', 'datetime', 'empty'):
+            return pd.Series(False, index=column.index)
+        if kind in ('string', 'unicode'):
+            dates = self.parse_date_strings(column, errors='coerce')
+            return column.notnull() & dates.isnull()
+        if not kind.startswith('mixed'):
+            return column.notnull()
+        is_string = column.str.len().notnull()
+        dates = self.parse_date_strings(column.where(is_string), errors='coerce')
+        is_date = column.map(lambda data: isinstance(data, dt.date)).astype(bool)
+        return column.notnull() & ~is_date & dates.isnull()
+
+    def parse_date_strings(self, column, errors='raise'):
+        """Parse a column of date strings to a column of dt.date.
+
+        Each distinct string is parsed once, with the first date format from
+        get_date_formats that matches it. Strings pandas can not parse to
+        a timestamp, such as '12/31/9999' outside the nanosecond range of
+        older pandas, are parsed with format_date. Missing values stay
+        missing.
+
+        errors: 'raise' to raise a ValueError for a string matching no date
+          format, 'coerce' to return a missing value for it
+        """
+
+        codes, uniques = pd.factorize(column)
+        uniques = pd.Series(uniques, dtype=object)
+        dates = pd.Series(None, index=uniques.index, dtype=object)
+        for date_format in self.get_date_formats():
+            missing = dates.isnull()
+            if not missing.any():
+                break
+            parsed = pd.to_datetime(uniques[missing], format=date_format, errors='coerce')
+            dates[missing] = parsed.dt.date
+        for i in dates.index[dates.isnull()]:
+            try:
+                dates[i] = self.format_date(uniques[i])
+            except ValueError:
+                pass
+        missing = dates.isnull()
+        if errors == 'raise' and missing.any():
+            message = "time data {value!r} does not match format {format!r}".format(
+                value=uniques[missing].iloc[0], format=self.date_format)
+            raise ValueError(message)
+        dates = dates.reindex(codes)
+        dates.index = column.index
+        return dates
+
+
+def read_excel_parameters():
+    """Return the names of the arguments of pd.read_excel, None if it takes any keyword."""
+
+    try:
+        parameters = inspect.signature(pd.read_excel).parameters.values()
+    except AttributeError:
+        return None
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        return None
+    return frozenset(parameter.name for parameter in parameters)
+
+
 class ExcelPDProcessor(PDProcessor):
     """An Excel PDProcessor
 
@@ -133,11 +1006,15 @@ class ExcelPDProcessor(PDProcessor):
     encoding: sets the encoding of the file (default='iso-8859-1')
     skiprows: number of rows to skip (zero based) (default=0)
     usecols:
-      if None then parse all columns
+      if None then parse the source_cols of the data_map or, before
+      init_data_map, all columns
       if integer then indicates last column to be parsed
       if list of ints then indicates list of column numbers to be parsed
       If string then indicates comma separated list of Excel column letters and
       column ranges (e.g. "A:E" or "A,C,E:F"). Ranges are inclusive of both sides.
+    engine: the pd.read_excel engine, or 'stream' to read xlsx files row by row
+      into typed column buffers with pdprocessor.xlsx, which supports only
+      sheet_name, header, skiprows, skipfooter, names and usecols
     """
 
     sheet_name = 0
@@ -159,21 +1036,430 @@ class ExcelPDProcessor(PDProcessor):
     engine = None
     squeeze = False
     encoding = 'iso-8859-1'
+    excel_file = None
 
     data_map = None
 
+    def get_usecols(self):
+        """Return the columns to parse.
+
+        An explicit usecols is used as is. Otherwise, once init_data_map has
+        set source_cols, a callable selecting the source_cols by name is
+        returned so only those columns are parsed, missing columns are left
+        to validate_dataframe. All columns are parsed when
+        selects_source_cols is False.
+        """
+
+        if self.usecols is not None:
+            return self.usecols
+        source_cols = getattr(self, 'source_cols', None)
+        if not source_cols or not self.selects_source_cols():
+            return None
+        return ColumnSelector(source_cols)
+
+    def read_options(self):
+        """Return the keyword arguments for pd.read_excel.
+
+        date_parser, convert_float, squeeze and encoding are left out when
+        pd.read_excel no longer accepts them and they have their default value.
+        """
+
+        options = dict(sheet_name=self.sheet_name,
+                       header=self.header, skiprows=self.skiprows,
+                       skipfooter=self.skipfooter, index_col=self.index_col,
+                       names=self.names, usecols=self.get_usecols(),
+                       parse_dates=self.parse_dates, date_parser=self.date_parser,
+                       na_values=self.na_values, thousands=self.thousands,
+                       convert_float=self.convert_float, converters=self.converters,
+                       dtype=self.dtype, true_values=self.true_values,
+                       false_values=self.false_values, engine=self.engine,
+                       squeeze=self.squeeze, encoding=self.encoding)
+        supported = read_excel_parameters()
+        if supported is not None:
+            # options removed from later pandas are passed only when set
+            for name in list(options):
+                if name not in supported and options[name] == getattr(ExcelPDProcessor, name):
+                    del options[name]
+        return options
+
+    def stream_options(self):
+        """Return the keyword arguments for pdprocessor.xlsx.read_xlsx."""
+
+        return dict(sheet_name=self.sheet_name, header=self.header,
+                    skiprows=self.skiprows, skipfooter=self.skipfooter,
+                    names=self.names, usecols=self.get_usecols())
+
+    def read_header(self):
+        """Return the column names from the header of the sheet."""
+
+        if self.engine == STREAM_ENGINE:
+            from .xlsx import read_xlsx_header
+            return read_xlsx_header(self.path, **self.stream_options())
+        options = dict(sheet_name=self.sheet_name, header=self.header,
+                       skiprows=self.skiprows, names=self.names, nrows=0,
+                       engine=self.engine)
+        return self.read_excel(self.path, **options).columns.tolist()
+
+    def read_excel(self, path, **options):
+        """Read the sheet from excel_file if it is set, otherwise from path."""
+
+        if self.excel_file is None:
+            return pd.read_excel(path, **options)
+        options.pop('engine', None)
+        return pd.read_excel(self.excel_file, **options)
+
     def create_dataframe(self):
         """Create the dataframe."""
-        df = pd.read_excel(self.path, sheet_name=self.sheet_name,
-                           header=self.header, skiprows=self.skiprows, 
-                           skipfooter=self.skipfooter, index_col=self.index_col,
-                           names=self.names, usecols=self.usecols,
-                           parse_dates=self.parse_dates, date_parser=self.date_parser,
-                           na_values=self.na_values, thousands=self.thousands,
-                           convert_float=self.convert_float, converters=self.converters,
-                           dtype=self.dtype, true_values=self.true_values,
-                           false_values=self.false_values, engine=self.engine,
-                           squeeze=self.squeeze, encoding=self.encoding)
-        self.df = df
 
+        if self.engine == STREAM_ENGINE:
+            from .xlsx import read_xlsx
+            self.df = self.read_source(read_xlsx, **self.stream_options())
+            return
+        self.df = self.read_source(self.read_excel, **self.read_options())
+
+    def create_dataframe_chunks(self, chunksize):
+        """Yield dataframes of chunksize rows, read incrementally with engine='stream'."""
+
+        if self.engine != STREAM_ENGINE:
+            for df in super(ExcelPDProcessor, self).create_dataframe_chunks(chunksize):
+                yield df
+            return
+        if chunksize < 1:
+            message = 'chunksize must be a positive integer.'
+            raise PDProcessorError(message)
+        from .xlsx import read_xlsx_chunks
+        for df in read_xlsx_chunks(self.path, chunksize, **self.stream_options()):
+            yield df
+
+
+class WorkbookPDProcessor(Path):
+    """Process several sheets of an Excel workbook opened once.
+
+    sheets: list of (sheet_name, ExcelPDProcessor class) processing each sheet
+      with the data_map and reader options of the class
+    engine: the Excel engine used to open the workbook (default=None)
+    sheet_col: if set, self.df is the processed sheets concatenated with this
+      column holding the sheet name (default=None)
+    threads: the number of threads formatting the sheets (default=1)
+
+    After process, self.dfs is an OrderedDict of sheet name to dataframe.
+    """
+
+    sheets = None
+    engine = None
+    sheet_col = None
+    threads = 1
+
+    def process(self):
+        """Process the sheets of the workbook."""
+
+        if not self.sheets:
+            message = 'sheets is None.'
+            raise PDProcessorError(message)
+        memory = any(processor_class.instrument == 'memory'
+                     for sheet_name, processor_class in self.sheets)
+        started = start_tracing() if memory else False
+        try:
+            self.process_sheets()
+        finally:
+            stop_tracing(started)
+
+    def process_sheets(self):
+        """Read the sheets from the workbook opened once and format them."""
+
+        processors = self.create_processors()
+        excel_file = pd.ExcelFile(self.path, engine=self.engine)
+        try:
+            for processor in processors:
+                processor.excel_file = excel_file
+                processor.run_stage('validate_header')
+            for processor in processors:
+                processor.excel_file = excel_file
+                processor.run_stage('create_dataframe')
+                processor.excel_file = None
+                processor.run_stage('validate_dataframe')
+        finally:
+            close = getattr(excel_file, 'close', None)
+            if close is not None:
+                close()
+        if self.threads > 1:
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(self.threads)
+            try:
+                pool.map(self.format_sheet, processors)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for processor in processors:
+                self.format_sheet(processor)
+        self.dfs = OrderedDict((processor.sheet_name, processor.df)
+                               for processor in processors)
+        if self.sheet_col is not None:
+            self.df = self.concat_sheets()
+
+    def create_processors(self):
+        """Return a processor for each sheet with its data_map initialized."""
+
+        self.validate_path()
+        processors = []
+        for sheet_name, processor_class in self.sheets:
+            processor = processor_class(self.path)
+            processor.sheet_name = sheet_name
+            processor.run_stage('init_data_map')
+            processors.append(processor)
+        return processors
+
+    def format_sheet(self, processor):
+        """Run the preprocess, format_dataframe and postprocess stages."""
+
+        for stage in ('preprocess', 'format_dataframe', 'postprocess'):
+            processor.run_stage(stage)
+
+    def concat_sheets(self):
+        """Return the sheets concatenated with sheet_col holding the sheet name."""
+
+        dfs = [df.assign(**{self.sheet_col: sheet_name})
+               for sheet_name, df in self.dfs.items()]
+        return pd.concat(dfs, ignore_index=True)
+
+
+class CSVPDProcessor(PDProcessor):
+    """A CSV PDProcessor for csv and other delimited files.
+
+    sep: the delimiter (default=',')
+    encoding: sets the encoding of the file (default=None)
+    skiprows: number of rows to skip (zero based) (default=0)
+    usecols:
+      if None then parse the source_cols of the data_map or, before
+      init_data_map, all columns
+      if list of strings then indicates list of column names to be parsed
+    dtype: type name or dict of column name to type, a dict is combined with
+      the dtypes of the schema at schema_path (default=None)
+    engine: parser engine, 'c', 'python' or 'pyarrow' (default='c')
+    """
+
+    sep = ','
+    header = 0
+    skiprows = 0
+    skipfooter = 0
+    index_col = None
+    names = None
+    usecols = None
+    parse_dates = False
+    na_values = None
+    thousands = None
+    decimal = '.'
+    quotechar = '"'
+    converters = None
+    dtype = None
+    true_values = None
+    false_values = None
+    engine = 'c'
+    encoding = None
+
+    data_map = None
+
+    def get_usecols(self):
+        """Return the columns to parse.
+
+        An explicit usecols is used as is. Otherwise, once init_data_map has
+        set source_cols, only the source_cols found in the header are parsed,
+        missing columns are left to validate_dataframe. All columns are
+        parsed when selects_source_cols is False.
+        """
+
+        if self.usecols is not None:
+            return self.usecols
+        source_cols = getattr(self, 'source_cols', None)
+        if not source_cols or not self.selects_source_cols():
+            return None
+        source_cols = set(source_cols)
+        return [col for col in self.read_header() if col in source_cols]
+
+    def read_header(self):
+        """Return the column names from the header of the file."""
+
+        df = pd.read_csv(self.path, sep=self.sep, header=self.header,
+                         skiprows=self.skiprows, names=self.names,
+                         quotechar=self.quotechar, encoding=self.encoding,
+                         nrows=0)
+        return df.columns.tolist()
+
+    def get_dtype(self):
+        """Return the dtype option, dtype combined with the dtypes of the schema.
+
+        Columns with a converter are left to the converter.
+        """
+
+        if self.schema_path is None or not (self.dtype is None or isinstance(self.dtype, dict)):
+            return self.dtype
+        dtypes = OrderedDict(self.lock_schema().dtypes)
+        for col in self.converters or {}:
+            dtypes.pop(col, None)
+        dtypes.update(self.dtype or {})
+        return dtypes
+
+    def read_options(self, locked=True):
+        """Return the keyword arguments for pd.read_csv.
+
+        locked: if False the dtypes of the schema are not used
+        """
+
+        return dict(sep=self.sep, header=self.header,
+                    skiprows=self.skiprows, skipfooter=self.skipfooter,
+                    index_col=self.index_col, names=self.names,
+                    usecols=self.get_usecols(),
+                    parse_dates=self.parse_dates,
+                    na_values=self.na_values, thousands=self.thousands,
+                    decimal=self.decimal, quotechar=self.quotechar,
+                    converters=self.converters,
+                    dtype=self.get_dtype() if locked else self.dtype,
+                    true_values=self.true_values,
+                    false_values=self.false_values, engine=self.engine,
+                    encoding=self.encoding)
+
+    def read_csv(self, source, **options):
+        """Return the dataframe read from source with pd.read_csv.
+
+        When values do not fit the dtypes of the schema, the file is read
+        again with inferred dtypes, the drift is reported and the columns
+        that fit are converted to the schema.
+        """
+
+        if self.schema_path is None:
+            return pd.read_csv(source, **options)
+        if hasattr(source, 'seek'):
+            start = source.tell()
+        try:
+            return pd.read_csv(source, **options)
+        except (ValueError, TypeError):
+            if hasattr(source, 'seek'):
+                source.seek(start)
+            options['dtype'] = self.dtype
+            df = pd.read_csv(source, **options)
+        return self.fit_schema(df)
+
+    def read_sample(self):
+        """Return schema_sample rows of the file, read in schema_blocks blocks."""
+
+        options = self.read_options(locked=False)
+        options['skipfooter'] = 0
+        blocks = max(self.schema_blocks, 1)
+        rows = max(self.schema_sample // blocks, 1)
+        dfs = [pd.read_csv(self.path, nrows=rows, **options)]
+        if blocks > 1:
+            options.update(header=None, skiprows=0, names=self.read_header())
+            dfs.extend(self.read_blocks(blocks - 1, rows, options))
+        return pd.concat(dfs, ignore_index=True)
+
+    def read_blocks(self, blocks, rows, options):
+        """Return dataframes of up to rows rows read at random positions of the file.
+
+        A block starts at the line after a random byte offset, blocks that
+        can not be parsed, for example starting in a quoted value, are skipped.
+        """
+
+        size = complete_size(self.path)
+        if not size:
+            return []
+        generator = random.Random(size)
+        offsets = sorted(generator.randrange(size) for i in range(blocks))
+        dfs = []
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                f.readline()
+                lines = [f.readline() for i in range(rows)]
+                data = io.BytesIO(b''.join(lines))
+                try:
+                    dfs.append(pd.read_csv(data, **options))
+                except (ValueError, TypeError):
+                    pass
+        return dfs
+
+    def create_dataframe(self):
+        """Create the dataframe."""
+
+        self.df = self.read_source(self.read_csv, **self.read_options())
+
+    def create_dataframe_chunks(self, chunksize):
+        """Yield dataframes of chunksize rows read incrementally from the file.
+
+        The pyarrow engine does not read in chunks, use the 'c' engine.
+
+        With schema_path, from the first chunk with values not fitting the
+        schema the file is read again with inferred dtypes, the chunks
+        already yielded are skipped and each later chunk is converted with
+        fit_schema.
+        """
+
+        if chunksize < 1:
+            message = 'chunksize must be a positive integer.'
+            raise PDProcessorError(message)
+        options = self.read_options()
+        count = 0
+        try:
+            for df in pd.read_csv(self.path, chunksize=chunksize, **options):
+                count += 1
+                yield df
+        except (ValueError, TypeError):
+            if self.schema_path is None:
+                raise
+            options['dtype'] = self.dtype
+            for i, df in enumerate(pd.read_csv(self.path, chunksize=chunksize, **options)):
+                if i >= count:
+                    yield self.fit_schema(df)
+            return
+        if not count:
+            yield pd.read_csv(self.path, nrows=0, **options)
+
+    def process_incremental(self, state=None):
+        """Process the rows appended to the file since state.
+
+        Only the bytes appended after state.offset are parsed. A last line
+        without a newline is left for the next run. If the bytes processed
+        in state changed the whole file is processed.
+
+        state: the IncrementalState of the previous run or None
+        """
+
+        if self.skipfooter:
+            message = 'skipfooter is not supported by process_incremental.'
+            raise PDProcessorError(message)
+        started = self.start_report()
+        try:
+            for stage in ('validate_path', 'init_data_map', 'validate_header'):
+                self.run_stage(stage)
+            end = complete_size(self.path)
+            if state is not None and state.offset <= end:
+                checksum, end_checksum = prefix_checksums(self.path, [state.offset, end])
+                if checksum == state.checksum:
+                    if state.offset == end:
+                        self.df = state.df
+                        return state
+                    with self.time_stage('create_dataframe'):
+                        self.df = self.read_range(state.offset, end)
+                    return self.append_increment(state.df, end, end_checksum)
+            end_checksum = prefix_checksums(self.path, [end])[0]
+            with self.time_stage('create_dataframe'):
+                self.df = self.read_range(0, end)
+            self.run_stage('validate_dataframe')
+            return self.append_increment(None, end, end_checksum)
+        finally:
+            stop_tracing(started)
+
+    def read_range(self, start, end):
+        """Return the dataframe of the rows between bytes start and end.
+
+        Rows after the start of the file are read with the column names of
+        the header.
+        """
 
+        options = self.read_options()
+        if start > 0:
+            options.update(header=None, skiprows=0, names=self.read_header())
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            data = io.BytesIO(f.read(end - start))
+        return self.read_csv(data, **options)
@@ -0,0 +1,121 @@
+"""Locked schemas of source files with a stable layout.
+
+A Schema is inferred once from a sample of a source file and saved as json.
+Later runs read the file with the dtypes of the schema instead of inferring
+them over the whole file. Values that no longer fit their dtype are reported
+as SchemaDrift records. Missing values are not drift, an int64 column with
+missing values is left as float64 and a bool column as object, like pandas
+infers them.
+"""
+import json
+from collections import namedtuple, OrderedDict
+from .lazy import pd, ptypes
+
+
+class SchemaDrift(namedtuple('SchemaDrift', ['column', 'dtype', 'count', 'example'])):
+    """Values of a source column that do not fit its locked dtype.
+
+    column: the column name
+    dtype: the locked dtype
+    count: the number of values that do not fit
+    example: the first value that does not fit
+    """
+
+    __slots__ = ()
+
+
+def infer_dtype_name(column):
+    """Return the name of the dtype to lock column to, None to leave it unlocked.
+
+    Datetime columns are left to parse_dates, other non numeric columns are
+    locked to 'str'.
+    """
+
+    if ptypes.is_bool_dtype(column):
+        return 'bool'
+    if ptypes.is_integer_dtype(column):
+        return 'int64'
+    if ptypes.is_float_dtype(column):
+        return 'float64'
+    if ptypes.is_datetime64_any_dtype(column):
+        return None
+    return 'str'
+
+
+def invalid_values(column, dtype):
+    """Return a boolean pd.Series that is True for the values not fitting dtype."""
+
+    if dtype in ('int64', 'float64'):
+        numbers = pd.to_numeric(column, errors='coerce')
+        if dtype == 'float64':
+            return column.notnull() & numbers.isnull()
+        return column.notnull() & (numbers.isnull() | (numbers % 1 != 0))
+    if dtype == 'bool':
+        return column.notnull() & ~column.isin([True, False])
+    return pd.Series(False, index=column.index)
+
+
+class Schema(object):
+    """The locked dtypes of the columns of a source file.
+
+    dtypes: an OrderedDict of column name to dtype name
+    """
+
+    def __init__(self, dtypes):
+        self.dtypes = OrderedDict(dtypes)
+
+    @classmethod
+    def infer(cls, df):
+        """Return the schema of the columns of the sample dataframe df."""
+
+        dtypes = OrderedDict()
+        for col in df.columns:
+            dtype = infer_dtype_name(df[col])
+            if dtype is not None:
+                dtypes[col] = dtype
+        return cls(dtypes)
+
+    def save(self, path):
+        """Save the schema to path as json."""
+
+        with open(path, 'w') as f:
+            json.dump({'dtypes': list(self.dtypes.items())}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Return the schema saved at path or None."""
+
+        try:
+            with open(path) as f:
+                return cls(json.load(f)['dtypes'])
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def find_drift(self, df):
+        """Return a list of SchemaDrift for the columns of df not fitting the schema."""
+
+        drift = []
+        for col in df.columns:
+            dtype = self.dtypes.get(col)
+            if dtype is None or str(df[col].dtype) == dtype:
+                continue
+            invalid = invalid_values(df[col], dtype)
+            if invalid.any():
+                drift.append(SchemaDrift(col, dtype, int(invalid.sum()),
+                                         df[col][invalid].iloc[0]))
+        return drift
+
+    def apply(self, df, exclude=()):
+        """Return df with its columns converted to their locked dtypes.
+
+        exclude: columns left as they are, for example the drifted columns
+        """
+
+        for col in df.columns:
+            dtype = self.dtypes.get(col)
+            if dtype in (None, 'str') or col in exclude or str(df[col].dtype) == dtype:
+                continue
+            if dtype in ('int64', 'bool') and df[col].isnull().any():
+                continue
+            df[col] = df[col].astype(dtype)
+        return df
@@ -0,0 +1,87 @@
+"""Zero-copy handoff of dataframes between processes.
+
+A dataframe is published once as an uncompressed Arrow IPC file, in
+/dev/shm when it exists so the data stays in shared memory. The small,
+picklable SharedFrame handle is passed to other processes, which memory-map
+the file instead of receiving a pickled copy of the dataframe. The publisher
+owns the file and removes it with unlink, or by using the handle as a
+context manager, once every consumer is done.
+
+Requires pyarrow.
+"""
+import os
+import uuid
+import tempfile
+
+SHM_DIR = '/dev/shm'
+
+
+def get_shared_dir():
+    """Return /dev/shm if it exists, otherwise the temporary directory."""
+
+    if os.path.isdir(SHM_DIR):
+        return SHM_DIR
+    return tempfile.gettempdir()
+
+
+class SharedFrame(object):
+    """A handle to a dataframe published as a memory-mapped Arrow file.
+
+    path: the path of the Arrow IPC file
+    num_rows: the number of rows of the dataframe
+    """
+
+    def __init__(self, path, num_rows):
+        self.path = path
+        self.num_rows = num_rows
+
+    def __repr__(self):
+        return 'SharedFrame({path!r}, {num_rows!r})'.format(path=self.path,
+                                                            num_rows=self.num_rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlink()
+        return False
+
+    @classmethod
+    def publish(cls, df, directory=None):
+        """Write df to a new Arrow file in directory and return its handle.
+
+        directory: the directory of the file, None for get_shared_dir()
+        """
+
+        import pyarrow as pa
+        directory = directory or get_shared_dir()
+        path = os.path.join(directory, 'pdprocessor-{id}.arrow'.format(id=uuid.uuid4().hex))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return cls(path, table.num_rows)
+
+    def read_table(self):
+        """Return the pyarrow Table memory-mapped from the file, no data is copied."""
+
+        import pyarrow as pa
+        source = pa.memory_map(self.path, 'r')
+        return pa.ipc.open_file(source).read_all()
+
+    def read_dataframe(self):
+        """Return the dataframe.
+
+        Numeric columns without missing values are not copied, other
+        columns are converted to pandas.
+        """
+
+        return self.read_table().to_pandas(split_blocks=True)
+
+    def unlink(self):
+        """Remove the file, mapped tables stay valid until released."""
+
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,251 @@
+"""Output sinks writing processed dataframes to files.
+
+A sink is written to one dataframe at a time, so a chunked run only holds
+one chunk in memory, and closed when the run is done:
+
+    with ParquetSink('out.parquet', row_group_size=100000) as sink:
+        processor.process_to_sink(sink, chunksize=100000)
+
+With partition_col the path is a directory and the rows of each value of
+partition_col are written to '<path>/<partition_col>=<value>/part-0<ext>'
+without the partition column. Rows with a missing partition value are
+written to '<path>/<partition_col>=__null__'.
+
+ParquetSink and FeatherSink require pyarrow.
+"""
+import os
+import gzip
+from .pdprocessor import PDProcessorError
+
+# the partition directory value of rows with a missing partition value
+NULL_PARTITION = '__null__'
+
+
+class Sink(object):
+    """Base class for an output sink.
+
+    path: the output file, or directory when partition_col is set
+    compression: the compression codec or None
+    row_group_size: the maximum rows of a row group or record batch, None
+      to write each dataframe as one
+    partition_col: the column to partition the output by or None
+    """
+
+    extension = ''
+
+    def __init__(self, path, compression=None, row_group_size=None, partition_col=None):
+        self.path = path
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.partition_col = partition_col
+        self.partitions = {}
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write(self, df):
+        """Write df to the sink."""
+
+        self.rows += len(df)
+        if self.partition_col is None:
+            self.write_dataframe(df)
+            return
+        missing = df[self.partition_col].isnull()
+        for value, part in df[~missing].groupby(self.partition_col, sort=False):
+            self.write_partition(value, part)
+        if missing.any():
+            self.write_partition(None, df[missing])
+
+    def write_partition(self, value, df):
+        """Write the rows df where partition_col is value, None for missing values."""
+
+        sink = self.partitions.get(value)
+        if sink is None:
+            sink = self.partitions[value] = self.create_partition(value)
+        sink.write(df.drop(self.partition_col, axis=1))
+
+    def create_partition(self, value):
+        """Return the sink for the rows where partition_col is value."""
+
+        directory = os.path.join(self.path, '{col}={value}'.format(
+            col=self.partition_col, value=NULL_PARTITION if value is None else value))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, 'part-0' + self.extension)
+        return type(self)(path, compression=self.compression,
+                          row_group_size=self.row_group_size)
+
+    def close(self):
+        """Close the sink and its partitions."""
+
+        for sink in self.partitions.values():
+            sink.close()
+        self.close_file()
+
+    def write_dataframe(self, df):
+        """Write df to the output file."""
+
+        raise NotImplementedError
+
+    def close_file(self):
+        """Close the output file."""
+
+        pass
+
+
+class ArrowSink(Sink):
+    """Base class for sinks writing pyarrow tables.
+
+    The schema of the file is taken from the first dataframe, later
+    dataframes are converted to it. A later chunk may need wider types than
+    the first one, for example when each chunk is compacted, so integers
+    are written as 64 bit integers, floats as float64 and dictionary indices
+    as int32.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ArrowSink, self).__init__(*args, **kwargs)
+        self.schema = None
+        self.writer = None
+
+    def write_dataframe(self, df):
+        import pyarrow as pa
+        try:
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            message = 'Dataframe does not fit the schema of the sink: {error}'.format(error=e)
+            raise PDProcessorError(message, self.path)
+        if self.writer is None:
+            self.schema = widen_schema(table.schema)
+            table = table.cast(self.schema)
+            self.writer = self.open_writer(self.schema)
+        self.write_table(table)
+
+    def close_file(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def open_writer(self, schema):
+        """Return the writer for the output file."""
+
+        raise NotImplementedError
+
+    def write_table(self, table):
+        """Write table with the writer."""
+
+        raise NotImplementedError
+
+
+def widen_type(data_type):
+    """Return the widest pyarrow type of the kind of data_type."""
+
+    import pyarrow as pa
+    if pa.types.is_signed_integer(data_type):
+        return pa.int64()
+    if pa.types.is_unsigned_integer(data_type):
+        return pa.uint64()
+    if pa.types.is_floating(data_type):
+        return pa.float64()
+    if pa.types.is_dictionary(data_type):
+        return pa.dictionary(pa.int32(), data_type.value_type, data_type.ordered)
+    return data_type
+
+
+def widen_schema(schema):
+    """Return schema with the types of its fields widened with widen_type."""
+
+    import pyarrow as pa
+    fields = [field.with_type(widen_type(field.type)) for field in schema]
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class ParquetSink(ArrowSink):
+    """A sink writing a Parquet file (default compression='snappy')."""
+
+    extension = '.parquet'
+
+    def __init__(self, path, compression='snappy', row_group_size=None,
+                 partition_col=None):
+        super(ParquetSink, self).__init__(path, compression, row_group_size,
+                                          partition_col)
+
+    def open_writer(self, schema):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.path, schema, compression=self.compression or 'none')
+
+    def write_table(self, table):
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+
+
+class FeatherSink(ArrowSink):
+    """A sink writing a Feather (Arrow IPC) file.
+
+    compression: None, 'lz4' or 'zstd'
+    """
+
+    extension = '.feather'
+
+    def open_writer(self, schema):
+        import pyarrow as pa
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(self.path, schema, options=options)
+
+    def write_table(self, table):
+        for batch in table.to_batches(max_chunksize=self.row_group_size):
+            self.writer.write_batch(batch)
+
+
+class CSVSink(Sink):
+    """A sink writing a csv file.
+
+    compression: None or 'gzip'
+    """
+
+    extension = '.csv'
+
+    def __init__(self, *args, **kwargs):
+        super(CSVSink, self).__init__(*args, **kwargs)
+        self.file = None
+
+    def write_dataframe(self, df):
+        header = self.file is None
+        if header:
+            if self.compression == 'gzip':
+                self.file = gzip.open(self.path, 'wt')
+            elif self.compression is None:
+                self.file = open(self.path, 'w')
+            else:
+                message = "Compression '{compression}' is not supported.".format(
+                    compression=self.compression)
+                raise PDProcessorError(message)
+        df.to_csv(self.file, header=header, index=False,
+                  chunksize=self.row_group_size)
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+SINKS = {
+    'parquet': ParquetSink,
+    'feather': FeatherSink,
+    'csv': CSVSink,
+}
+
+
+def get_sink(output_format, path, **kwargs):
+    """Return the sink for output_format ('parquet', 'feather' or 'csv')."""
+
+    try:
+        sink_class = SINKS[output_format]
+    except KeyError:
+        message = "Output format '{format}' is not supported.".format(format=output_format)
+        raise PDProcessorError(message)
+    return sink_class(path, **kwargs)
@@ -0,0 +1,226 @@
+"""A streaming xlsx reader filling typed column buffers.
+
+The sheet is read row by row with openpyxl in read-only mode. Only the
+selected columns are kept, numbers in array buffers of int64 or float64
+while the column holds only numbers, so no object array of every cell is
+built before the dataframe. ExcelPDProcessor uses it with engine='stream'.
+
+Only sheet_name, header, skiprows, skipfooter, names and usecols (None, a
+callable or a list of names or positions) are supported. Blank rows are
+skipped like pd.read_excel does.
+
+Requires openpyxl.
+"""
+from array import array
+from collections import deque
+from .lazy import np, pd
+from .pdprocessor import PDProcessorError
+
+try:
+    INTEGER_TYPES = (int, long)
+except NameError:
+    INTEGER_TYPES = (int,)
+
+NAN = float('nan')
+
+
+class ColumnBuffer(object):
+    """The values of a column, in an array while the values are numbers.
+
+    The buffer starts as an int64 array, becomes a float64 array at the first
+    float or missing value and a list at the first other value or integer
+    not fitting int64.
+    """
+
+    def __init__(self):
+        self.kind = 'int'
+        self.values = array('q')
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        kind = type(value)
+        if self.kind == 'int':
+            if kind in INTEGER_TYPES:
+                try:
+                    self.values.append(value)
+                    return
+                except OverflowError:
+                    # beyond int64, kept as python ints like pd.read_excel does
+                    self.to_list()
+            elif kind is float or value is None:
+                self.kind = 'float'
+                self.values = array('d', self.values)
+            else:
+                self.to_list()
+        if self.kind == 'float':
+            if kind is float or kind in INTEGER_TYPES:
+                self.values.append(value)
+                return
+            if value is None:
+                self.values.append(NAN)
+                return
+            self.to_list()
+        self.values.append(value)
+
+    def to_list(self):
+        self.kind = 'object'
+        self.values = list(self.values)
+
+    def to_series(self, name, index):
+        """Return the values as a pd.Series."""
+
+        if self.kind == 'int':
+            values = np.frombuffer(self.values, dtype='int64') if self.values else []
+            return pd.Series(values, index=index, name=name, dtype='int64')
+        if self.kind == 'float':
+            values = np.frombuffer(self.values, dtype='float64') if self.values else []
+            return pd.Series(values, index=index, name=name, dtype='float64')
+        return pd.Series(self.values, index=index, name=name)
+
+
+def get_skip(skiprows):
+    """Return a function of the row number returning True for the rows to skip."""
+
+    if not skiprows:
+        return lambda i: False
+    if callable(skiprows):
+        return skiprows
+    if isinstance(skiprows, INTEGER_TYPES):
+        return lambda i: i < skiprows
+    skiprows = frozenset(skiprows)
+    return lambda i: i in skiprows
+
+
+def get_indices(columns, usecols):
+    """Return the positions of the columns selected by usecols."""
+
+    if usecols is None:
+        return list(range(len(columns)))
+    if callable(usecols):
+        return [i for i, col in enumerate(columns) if usecols(col)]
+    if isinstance(usecols, str):
+        message = "usecols '{usecols}' is not supported by the stream engine.".format(
+            usecols=usecols)
+        raise PDProcessorError(message)
+    usecols = list(usecols)
+    if all(isinstance(col, INTEGER_TYPES) for col in usecols):
+        return [i for i in range(len(columns)) if i in usecols]
+    return [i for i, col in enumerate(columns) if col in usecols]
+
+
+def get_header(row):
+    """Return the column names of a header row, blank cells are named like pandas."""
+
+    return [u'Unnamed: {0}'.format(i) if value is None else value
+            for i, value in enumerate(row)]
+
+
+def is_blank(row):
+    for value in row:
+        if value is not None and value != '':
+            return False
+    return True
+
+
+def open_sheet(path, sheet_name):
+    """Return the workbook at path opened read-only and its sheet sheet_name."""
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, INTEGER_TYPES):
+            return workbook, workbook.worksheets[sheet_name]
+        return workbook, workbook[sheet_name]
+    except (IndexError, KeyError):
+        workbook.close()
+        message = "Sheet '{sheet}' is not in '{path}'.".format(sheet=sheet_name, path=path)
+        raise PDProcessorError(message)
+
+
+def read_xlsx_chunks(path, chunksize=None, sheet_name=0, header=0, skiprows=0,
+                     skipfooter=0, names=None, usecols=None):
+    """Yield dataframes of chunksize rows of the sheet, all rows if chunksize is None.
+
+    At least one dataframe is yielded, the index continues across chunks.
+    """
+
+    skip = get_skip(skiprows)
+    workbook, sheet = open_sheet(path, sheet_name)
+    try:
+        rows = (row for i, row in enumerate(sheet.iter_rows(values_only=True))
+                if not skip(i) and not is_blank(row))
+        columns = None
+        if header is not None:
+            row = None
+            for i in range(header + 1):
+                row = next(rows, None)
+            columns = get_header(row or ())
+        if names is not None:
+            columns = list(names)
+        indices = None if columns is None else get_indices(columns, usecols)
+        footer = deque()
+        buffers = None
+        start = count = 0
+        for row in rows:
+            if skipfooter:
+                footer.append(row)
+                if len(footer) <= skipfooter:
+                    continue
+                row = footer.popleft()
+            if indices is None:
+                columns = list(range(len(row)))
+                indices = get_indices(columns, usecols)
+            if buffers is None:
+                buffers = [ColumnBuffer() for i in indices]
+            width = len(row)
+            for buffer, i in zip(buffers, indices):
+                buffer.append(row[i] if i < width else None)
+            count += 1
+            if count == chunksize:
+                yield build_dataframe(columns, indices, buffers, start, count)
+                buffers = None
+                start += count
+                count = 0
+        if count or not start:
+            yield build_dataframe(columns, indices, buffers, start, count)
+    finally:
+        workbook.close()
+
+
+def build_dataframe(columns, indices, buffers, start, count):
+    """Return the dataframe of the buffers of the selected columns."""
+
+    if indices is None:
+        return pd.DataFrame()
+    names = [columns[i] for i in indices]
+    index = pd.RangeIndex(start, start + count)
+    if buffers is None:
+        return pd.DataFrame(index=index, columns=names)
+    data = [buffer.to_series(name, index) for name, buffer in zip(names, buffers)]
+    return pd.concat(data, axis=1) if data else pd.DataFrame(index=index)
+
+
+def read_xlsx(path, **options):
+    """Return the sheet of the xlsx file at path as a dataframe.
+
+    options: the keyword arguments of read_xlsx_chunks except chunksize
+    """
+
+    chunks = read_xlsx_chunks(path, **options)
+    try:
+        return next(chunks)
+    finally:
+        chunks.close()
+
+
+def read_xlsx_header(path, **options):
+    """Return the column names of the sheet, reading only its first rows."""
+
+    options.update(skipfooter=0, usecols=None)
+    chunks = read_xlsx_chunks(path, chunksize=1, **options)
+    try:
+        return next(chunks).columns.tolist()
+    finally:
+        chunks.close()
@@ -35,7 +35,12 @@ setup(
     package_dir={'pdprocessor': 'pdprocessor'},
     include_package_data=True,
     install_requires=[
+        'pandas>=0.24.0',
     ],
+    extras_require={
+        'parquet': ['pyarrow>=0.13.0'],
+        'xlsx': ['openpyxl>=2.6.0'],
+    },
     license='MIT',
     zip_safe=False,
     keywords='pdprocessor',
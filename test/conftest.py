@@ -3,7 +3,7 @@
 
 import pytest
 import pandas as pd
-from pdprocessor.pdprocessor import ExcelPDProcessor
+from pdprocessor.pdprocessor import ExcelPDProcessor, CSVPDProcessor
 
 
 @pytest.fixture
@@ -43,3 +43,8 @@ def excelpdprocessor():
     processor = ExcelPDProcessor(sfile)
     return processor
 
+@pytest.fixture
+def csvpdprocessor():
+    sfile = 'data/SampleData.csv'
+    processor = CSVPDProcessor(sfile)
+    return processor
@@ -0,0 +1,120 @@
+"""
+Tests for `pdprocessor.aio` module.
+"""
+import sys
+import pytest
+
+if sys.version_info < (3, 7):
+    pytest.skip('asyncio tests require Python 3.7', allow_module_level=True)
+
+import os
+import asyncio
+import threading
+from mock import Mock
+from concurrent.futures import ThreadPoolExecutor
+from pdprocessor.pdprocessor import PDProcessorError, CSVPDProcessor
+from pdprocessor.aio import process_async, process_many
+from pdprocessor.cache import DataFrameCache
+
+
+class SampleProcessor(CSVPDProcessor):
+
+    data_map = [
+        ('Date', 'OrderDate', 'format_date'),
+        ('Region', 'Region', 'format_uppercase')]
+
+
+class TestProcessAsync(object):
+
+    def test_aprocess(self):
+        processor = SampleProcessor('data/SampleData.csv')
+        result = asyncio.run(processor.aprocess())
+        assert result is processor
+        assert processor.df.shape == (43, 2)
+
+    def test_aprocess_with_instrument(self):
+        processor = SampleProcessor('data/SampleData.csv')
+        processor.instrument = True
+        asyncio.run(processor.aprocess())
+        names = [record.name for record in processor.report]
+        assert names[0] == 'validate_path'
+        assert 'format_dataframe:Date' in names
+
+    def test_aprocess_with_result_cache(self, tmpdir):
+        pytest.importorskip('pyarrow')
+        processor = SampleProcessor('data/SampleData.csv')
+        processor.result_cache = DataFrameCache(str(tmpdir))
+        asyncio.run(processor.aprocess())
+        assert len(os.listdir(str(tmpdir))) == 1
+        other = SampleProcessor('data/SampleData.csv')
+        other.result_cache = DataFrameCache(str(tmpdir))
+        other.create_dataframe = Mock()
+        asyncio.run(other.aprocess())
+        assert other.create_dataframe.call_count == 0
+        assert other.df.equals(processor.df)
+
+    def test_process_async_with_executor(self):
+        threads = set()
+
+        class Processor(SampleProcessor):
+            def preprocess(self):
+                threads.add(threading.current_thread().name)
+
+        processor = Processor('data/SampleData.csv')
+        with ThreadPoolExecutor(1, thread_name_prefix='stage') as executor:
+            asyncio.run(process_async(processor, executor))
+        assert [name.startswith('stage') for name in threads] == [True]
+
+    def test_process_async_with_error(self):
+        processor = SampleProcessor('invalid_path')
+        with pytest.raises(PDProcessorError) as excinfo:
+            asyncio.run(processor.aprocess())
+        assert excinfo.value.message == "No file found at 'invalid_path'."
+
+    def test_process_async_cancel(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        class Processor(SampleProcessor):
+            def create_dataframe(self):
+                started.set()
+                release.wait(5)
+                super(Processor, self).create_dataframe()
+
+        processor = Processor('data/SampleData.csv')
+
+        async def run():
+            task = asyncio.ensure_future(processor.aprocess())
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, started.wait, 5)
+            task.cancel()
+            release.set()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        assert processor.df.columns.tolist() == ['OrderDate', 'Region']
+
+
+class TestProcessMany(object):
+
+    def test_process_many(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        class Processor(SampleProcessor):
+            def preprocess(self):
+                with lock:
+                    active.append(self)
+                    peak.append(len(active))
+                threading.Event().wait(0.05)
+                with lock:
+                    active.remove(self)
+
+        processors = [Processor('data/SampleData.csv') for i in range(4)]
+        processors.append(Processor('invalid_path'))
+        results = asyncio.run(process_many(processors, max_concurrency=2))
+        assert results[:4] == processors[:4]
+        assert isinstance(results[4], PDProcessorError)
+        assert max(peak) <= 2
@@ -0,0 +1,112 @@
+"""
+Tests for `pdprocessor.batch` module.
+"""
+import os
+import pytest
+import pandas as pd
+from pdprocessor.pdprocessor import PDProcessorError, CSVPDProcessor
+from pdprocessor.batch import (BatchResult, process_file, process_batch,
+                               concat_results)
+
+
+class SampleProcessor(CSVPDProcessor):
+
+    data_map = [
+        ('Date', 'OrderDate', 'format_date'),
+        ('Region', 'Region', 'format_uppercase'),
+        ('Qty', 'Units', None)]
+
+
+class TestBatchResult(object):
+
+    def test__init__(self):
+        result = BatchResult('path')
+        assert result.path == 'path'
+        assert result.df is None
+        assert result.error is None
+        assert result.output_path is None
+        assert result.ok
+
+    def test_ok_with_error(self):
+        result = BatchResult('path', error=PDProcessorError('Error!'))
+        assert not result.ok
+
+
+class TestProcessFile(object):
+
+    def test_process_file(self):
+        result = process_file(SampleProcessor, 'data/SampleData.csv')
+        assert result.ok
+        assert result.df.shape == (43, 3)
+
+    def test_process_file_with_invalid_path(self):
+        result = process_file(SampleProcessor, 'invalid_path')
+        assert isinstance(result.error, PDProcessorError)
+        assert result.error.message == "No file found at 'invalid_path'."
+
+    def test_process_file_with_other_error(self, tmpdir):
+        sfile = tmpdir.join('data.csv')
+        sfile.write('OrderDate,Region,Units\nnot a date,East,1\n')
+        result = process_file(SampleProcessor, str(sfile))
+        assert isinstance(result.error, PDProcessorError)
+        assert result.error.message.startswith("Failed to process '")
+
+    def test_process_file_with_output_dir(self, tmpdir):
+        result = process_file(SampleProcessor, 'data/SampleData.csv',
+                              output_dir=str(tmpdir), output_format='csv')
+        assert result.df is None
+        assert result.output_path == str(tmpdir.join('SampleData.csv'))
+        df = pd.read_csv(result.output_path)
+        assert df.columns.tolist() == ['Date', 'Region', 'Qty']
+
+    def test_process_file_with_invalid_output_format(self, tmpdir):
+        result = process_file(SampleProcessor, 'data/SampleData.csv',
+                              output_dir=str(tmpdir), output_format='xml')
+        assert result.error.message == "Output format 'xml' is not supported."
+
+
+class TestProcessBatch(object):
+
+    def test_process_batch(self):
+        paths = ['data/SampleData.csv', 'invalid_path', 'data/SampleData.csv']
+        results = process_batch(SampleProcessor, paths, processes=2)
+        assert [result.path for result in results] == paths
+        assert [result.ok for result in results] == [True, False, True]
+        assert results[1].error.message == "No file found at 'invalid_path'."
+        assert results[2].df['Region'].tolist()[0] == 'EAST'
+
+    def test_process_batch_in_process(self, tmpdir):
+        output_dir = str(tmpdir.join('output'))
+        results = process_batch(SampleProcessor, ['data/SampleData.csv'],
+                                processes=1, output_dir=output_dir,
+                                output_format='csv')
+        assert os.listdir(output_dir) == ['SampleData.csv']
+        assert results[0].ok
+
+    def test_process_batch_with_colliding_outputs(self, tmpdir):
+        """Ensure files writing the same output file raise a PDProcessorError."""
+
+        output_dir = str(tmpdir.join('output'))
+        paths = ['data/SampleData.csv', 'other/SampleData.xlsx']
+        with pytest.raises(PDProcessorError) as excinfo:
+            process_batch(SampleProcessor, paths, processes=1, output_dir=output_dir)
+        expected = ("'data/SampleData.csv' and 'other/SampleData.xlsx' would both be "
+                    "written to '{0}'.")
+        assert excinfo.value.message == expected.format(
+            os.path.join(output_dir, 'SampleData.parquet'))
+        assert not os.path.exists(output_dir)
+
+
+class TestConcatResults(object):
+
+    def test_concat_results(self):
+        results = process_batch(SampleProcessor,
+                                ['data/SampleData.csv', 'invalid_path'],
+                                processes=1)
+        df = concat_results(results, path_col='path')
+        assert df.shape == (43, 4)
+        assert df['path'].unique().tolist() == ['data/SampleData.csv']
+
+    def test_concat_results_without_dataframes(self):
+        df = concat_results([BatchResult('path')])
+        assert df.empty
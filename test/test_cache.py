@@ -0,0 +1,234 @@
+"""
+Tests for `pdprocessor.cache` module.
+"""
+import os
+import time
+import pytest
+import pandas as pd
+from mock import Mock
+from pdprocessor.cache import file_fingerprint, class_fingerprint, DataFrameCache
+from pdprocessor.pdprocessor import CSVPDProcessor
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+requires_pyarrow = pytest.mark.skipif(pyarrow is None, reason='requires pyarrow')
+
+
+class TestFileFingerprint(object):
+
+    def test_file_fingerprint(self, tmpdir):
+        sfile = tmpdir.join('data.csv')
+        sfile.write('a,b\n1,2\n')
+        fingerprint = file_fingerprint(str(sfile))
+        assert fingerprint == file_fingerprint(str(sfile))
+        sfile.write('a,b\n1,3\n')
+        assert fingerprint != file_fingerprint(str(sfile))
+
+    def test_file_fingerprint_without_hash_contents(self, tmpdir):
+        sfile = tmpdir.join('data.csv')
+        sfile.write('a,b\n1,2\n')
+        fingerprint = file_fingerprint(str(sfile), hash_contents=False)
+        sfile.write('a,b\n1,2\n3,4\n')
+        assert fingerprint != file_fingerprint(str(sfile), hash_contents=False)
+
+
+class TestClassFingerprint(object):
+
+    def test_class_fingerprint(self):
+        class Processor(CSVPDProcessor):
+            pass
+
+        fingerprint = class_fingerprint(CSVPDProcessor)
+        assert fingerprint == class_fingerprint(CSVPDProcessor)
+        assert class_fingerprint(Processor) != fingerprint
+
+
+@requires_pyarrow
+class TestDataFrameCache(object):
+
+    def test__init__(self, tmpdir):
+        directory = str(tmpdir.join('cache'))
+        cache = DataFrameCache(directory, max_size=10)
+        assert os.path.isdir(directory)
+        assert cache.max_size == 10
+        assert cache.hash_contents is True
+
+    def test_make_key(self, tmpdir):
+        sfile = tmpdir.join('data.csv')
+        sfile.write('a,b\n1,2\n')
+        cache = DataFrameCache(str(tmpdir.join('cache')))
+        key = cache.make_key(str(sfile), pd.read_csv, {'usecols': ['a']})
+        assert key == cache.make_key(str(sfile), pd.read_csv, {'usecols': ['a']})
+        assert key != cache.make_key(str(sfile), pd.read_csv, {'usecols': ['b']})
+
+    def test_make_key_with_lambdas(self, tmpdir):
+        """Test callables with the same name but other code or values make other keys."""
+
+        sfile = tmpdir.join('data.csv')
+        sfile.write('a,b\n1,2\n')
+        cache = DataFrameCache(str(tmpdir))
+        rows = (1, 2)
+        key = cache.make_key(str(sfile), {'skiprows': lambda i: i in (1, 2)})
+        assert key == cache.make_key(str(sfile), {'skiprows': lambda i: i in (1, 2)})
+        assert key != cache.make_key(str(sfile), {'skiprows': lambda i: 1 <= i <= 30})
+        assert key != cache.make_key(str(sfile), {'skiprows': lambda i: i in rows})
+        other = (1, 3)
+        assert (cache.make_key(str(sfile), {'skiprows': lambda i: i in rows}) !=
+                cache.make_key(str(sfile), {'skiprows': lambda i: i in other}))
+
+    def test_get_with_missing_key(self, tmpdir):
+        cache = DataFrameCache(str(tmpdir))
+        assert cache.get('missing') is None
+
+    def test_put_and_get(self, tmpdir, dataframe):
+        cache = DataFrameCache(str(tmpdir))
+        assert cache.put('key', dataframe)
+        df = cache.get('key')
+        assert df.columns.tolist() == dataframe.columns.tolist()
+        assert df['Float'].tolist() == [1.47, 0.0]
+
+    def test_evict(self, tmpdir, dataframe):
+        cache = DataFrameCache(str(tmpdir))
+        cache.put('old', dataframe)
+        cache.put('new', dataframe)
+        past = time.time() - 60
+        os.utime(cache.get_path('old'), (past, past))
+        cache.max_size = os.path.getsize(cache.get_path('new'))
+        cache.evict()
+        assert cache.get('old') is None
+        assert cache.get('new') is not None
+
+    def test_evict_with_max_age(self, tmpdir, dataframe):
+        cache = DataFrameCache(str(tmpdir), max_age=30)
+        cache.put('old', dataframe)
+        cache.put('new', dataframe)
+        past = time.time() - 60
+        os.utime(cache.get_path('old'), (past, past))
+        cache.evict()
+        assert not os.path.exists(cache.get_path('old'))
+        assert cache.get('new') is not None
+
+    def test_get_with_max_age(self, tmpdir, dataframe):
+        cache = DataFrameCache(str(tmpdir), max_age=30)
+        cache.put('key', dataframe)
+        past = time.time() - 60
+        os.utime(cache.get_path('key'), (past, past))
+        assert cache.get('key') is None
+
+    def test_clear(self, tmpdir, dataframe):
+        cache = DataFrameCache(str(tmpdir))
+        cache.put('key', dataframe)
+        cache.clear()
+        assert cache.get('key') is None
+
+
+@requires_pyarrow
+class TestReadSource(object):
+
+    def test_read_source_with_source_cache(self, tmpdir, dataframe):
+        """Test read_source reads the file once."""
+
+        sfile = tmpdir.join('data.csv')
+        sfile.write('a,b\n1,2\n')
+        processor = CSVPDProcessor(str(sfile))
+        processor.source_cache = DataFrameCache(str(tmpdir.join('cache')))
+        reader = Mock(return_value=dataframe, __name__='reader')
+        df = processor.read_source(reader, sep=',')
+        assert df is dataframe
+        df = processor.read_source(reader, sep=',')
+        assert reader.call_count == 1
+        assert df['Integer'].tolist() == [1, 2]
+
+    def test_create_dataframe_with_source_cache(self, tmpdir, csvpdprocessor,
+                                                excel_data_map):
+        processor = csvpdprocessor
+        processor.source_cache = DataFrameCache(str(tmpdir))
+        processor.data_map = excel_data_map
+        processor.process()
+        processor = CSVPDProcessor(processor.path)
+        processor.source_cache = DataFrameCache(str(tmpdir))
+        processor.data_map = excel_data_map
+        processor.process()
+        assert len(os.listdir(str(tmpdir))) == 1
+        assert processor.df.shape == (43, 5)
+
+    def test_create_dataframe_with_source_cache_and_lambdas(self, tmpdir, excel_data_map):
+        """Test a different callable skiprows is not served the cached parse."""
+
+        processor = CSVPDProcessor('data/SampleData.csv')
+        processor.source_cache = DataFrameCache(str(tmpdir))
+        processor.skiprows = lambda i: i in (1, 2)
+        processor.create_dataframe()
+        assert len(processor.df) == 41
+        processor = CSVPDProcessor('data/SampleData.csv')
+        processor.source_cache = DataFrameCache(str(tmpdir))
+        processor.skiprows = lambda i: 1 <= i <= 30
+        processor.create_dataframe()
+        assert len(processor.df) == 13
+
+
+@requires_pyarrow
+class TestResultCache(object):
+
+    def test_process_with_result_cache(self, tmpdir, csvpdprocessor, excel_data_map):
+        """Test process loads the result of an unchanged file and configuration."""
+
+        processor = csvpdprocessor
+        processor.result_cache = DataFrameCache(str(tmpdir))
+        processor.data_map = excel_data_map
+        processor.process()
+        expected = processor.df
+        processor = CSVPDProcessor(processor.path)
+        processor.result_cache = DataFrameCache(str(tmpdir))
+        processor.data_map = excel_data_map
+        processor.run_stages = Mock()
+        processor.process()
+        assert processor.run_stages.call_count == 0
+        assert processor.final_cols == ['Date', 'Region', 'Qty', 'Cost', 'Ext Cost']
+        assert processor.df.equals(expected)
+
+    def test_get_config(self, csvpdprocessor):
+        """Test get_config includes callable options but not methods."""
+
+        processor = csvpdprocessor
+        processor.converters = {'Units': int}
+        processor.skiprows = lambda i: i == 1
+        processor.process = Mock()
+        config = processor.get_config()
+        assert config['skiprows'] is processor.skiprows
+        assert config['converters'] == {'Units': int}
+        assert config['sep'] == ','
+        assert 'process' not in config
+        assert 'format_date' not in config
+
+    def test_result_key(self, tmpdir, csvpdprocessor, excel_data_map):
+        """Test the key changes with the configuration and the formatters."""
+
+        class Processor(CSVPDProcessor):
+            def format_date(self, data):
+                return data
+
+        processor = csvpdprocessor
+        processor.result_cache = DataFrameCache(str(tmpdir))
+        processor.data_map = excel_data_map
+        key = processor.result_key()
+        assert key == processor.result_key()
+        processor.skiprows = 1
+        assert processor.result_key() != key
+        key = processor.result_key()
+        processor.skiprows = lambda i: i == 1
+        assert processor.result_key() != key
+        key = processor.result_key()
+        processor.skiprows = lambda i: i == 2
+        assert processor.result_key() != key
+        key = processor.result_key()
+        processor.format_date = lambda data: data
+        assert processor.result_key() != key
+        processor.skiprows = 1
+        processor = Processor(processor.path)
+        processor.result_cache = DataFrameCache(str(tmpdir))
+        processor.data_map = excel_data_map
+        assert processor.result_key() != key
@@ -0,0 +1,181 @@
+"""
+Tests for `pdprocessor.distributed` module.
+"""
+import os
+import pickle
+import pytest
+from mock import Mock
+from pdprocessor.pdprocessor import PDProcessorError, CSVPDProcessor
+from pdprocessor.batch import BatchResult
+from pdprocessor.distributed import (ProcessorSpec, ThreadExecutor, ProcessExecutor,
+                                     QueueExecutor, LocalBroker, run_task, run_worker,
+                                     run_specs)
+
+
+class SampleProcessor(CSVPDProcessor):
+
+    data_map = [
+        ('Date', 'OrderDate', 'format_date'),
+        ('Region', 'Region', 'format_uppercase'),
+        ('Qty', 'Units', None)]
+
+
+class CrashingProcessor(SampleProcessor):
+    """Kills its worker process the first time, when marker does not exist."""
+
+    marker = None
+
+    def create_dataframe(self):
+        if not os.path.exists(self.marker):
+            open(self.marker, 'w').close()
+            os._exit(1)
+        super(CrashingProcessor, self).create_dataframe()
+
+
+CLASS_PATH = '{module}:SampleProcessor'.format(module=__name__)
+CRASHING_CLASS_PATH = '{module}:CrashingProcessor'.format(module=__name__)
+MISSING_CLASS_PATH = '{module}:Missing'.format(module=__name__)
+
+
+class TestProcessorSpec(object):
+
+    def test_from_processor(self):
+        processor = SampleProcessor('data/SampleData.csv')
+        processor.skiprows = [1]
+        spec = ProcessorSpec.from_processor(processor)
+        assert spec.class_path == CLASS_PATH
+        assert spec.path == 'data/SampleData.csv'
+        assert spec.config == {'skiprows': [1]}
+
+    def test_to_dict_and_from_dict(self):
+        spec = ProcessorSpec(CLASS_PATH, 'path', {'sep': ';'})
+        other = ProcessorSpec.from_dict(spec.to_dict())
+        assert other.to_dict() == spec.to_dict()
+
+    def test_get_class(self):
+        assert ProcessorSpec(CLASS_PATH, 'path').get_class() is SampleProcessor
+        with pytest.raises(PDProcessorError) as excinfo:
+            ProcessorSpec(MISSING_CLASS_PATH, 'path').get_class()
+        expected = "Processor class '{0}' can not be imported.".format(MISSING_CLASS_PATH)
+        assert excinfo.value.message == expected
+
+
+class TestRunTask(object):
+
+    def test_run_task(self):
+        task = {'spec': ProcessorSpec(CLASS_PATH, 'data/SampleData.csv',
+                                      {'skipfooter': 3, 'engine': 'python'}).to_dict()}
+        result = run_task(task)
+        assert result.ok
+        assert result.df.shape == (40, 3)
+
+    def test_run_task_with_errors(self):
+        result = run_task({'spec': ProcessorSpec(MISSING_CLASS_PATH, 'path').to_dict()})
+        assert result.error.path == 'path'
+        result = run_task({'spec': ProcessorSpec(CLASS_PATH, 'invalid_path').to_dict()})
+        assert result.error.to_dict() == {'message': "No file found at 'invalid_path'.",
+                                          'path': 'invalid_path', 'cause': None}
+        assert not result.retryable
+
+
+class TestBatchResult(object):
+
+    def test_to_dict_and_from_dict(self):
+        error = PDProcessorError('Error!', 'path', 'MemoryError')
+        result = BatchResult.from_dict(BatchResult('path', error=error, attempts=2).to_dict())
+        assert result.error.to_dict() == error.to_dict()
+        assert result.attempts == 2
+        assert result.retryable
+
+    def test_pickle_error(self):
+        error = pickle.loads(pickle.dumps(PDProcessorError('Error!', 'path', 'IOError')))
+        assert error.to_dict() == {'message': 'Error!', 'path': 'path', 'cause': 'IOError'}
+
+
+class TestRunSpecs(object):
+
+    def specs(self):
+        return [ProcessorSpec(CLASS_PATH, path)
+                for path in ['data/SampleData.csv', 'invalid_path']]
+
+    def test_run_specs_with_threads(self):
+        with ThreadExecutor(2) as executor:
+            results = run_specs(self.specs(), executor)
+        assert [result.ok for result in results] == [True, False]
+        assert results[0].df['Region'].tolist()[0] == 'EAST'
+
+    def test_run_specs_with_processes(self):
+        with ProcessExecutor(2) as executor:
+            results = run_specs(self.specs(), executor)
+        assert [result.ok for result in results] == [True, False]
+
+    def test_run_specs_with_dead_worker(self, tmpdir):
+        """Test the tasks of a worker process that dies are retried on a new pool."""
+
+        marker = str(tmpdir.join('crashed'))
+        specs = [ProcessorSpec(CRASHING_CLASS_PATH, 'data/SampleData.csv',
+                               {'marker': marker})] + self.specs()
+        with ProcessExecutor(2) as executor:
+            results = run_specs(specs, executor, retries=1)
+        assert os.path.exists(marker)
+        assert [result.ok for result in results] == [True, True, False]
+        assert results[0].attempts == 2
+
+    def test_process_executor_with_dead_worker(self, tmpdir):
+        marker = str(tmpdir.join('crashed'))
+        spec = ProcessorSpec(CRASHING_CLASS_PATH, 'data/SampleData.csv', {'marker': marker})
+        with ProcessExecutor(1) as executor:
+            result, = executor.run([{'spec': spec.to_dict()}])
+            assert executor.pool is None
+        assert result.error.cause == 'BrokenProcessPool'
+        assert result.retryable
+
+    def test_run_specs_with_queue(self, tmpdir):
+        broker = LocalBroker()
+        broker.start_workers(2)
+        try:
+            results = run_specs(self.specs(), QueueExecutor(broker, timeout=30),
+                                output_dir=str(tmpdir), output_format='csv')
+        finally:
+            broker.stop_workers()
+        assert [result.ok for result in results] == [True, False]
+        assert results[0].df is None
+        assert os.path.isfile(results[0].output_path)
+        assert results[1].error.message == "No file found at 'invalid_path'."
+
+    def test_run_specs_with_colliding_outputs(self, tmpdir):
+        specs = [ProcessorSpec(CLASS_PATH, 'a/data.csv'), ProcessorSpec(CLASS_PATH, 'b/data.csv')]
+        with pytest.raises(PDProcessorError):
+            run_specs(specs, Mock(spec=['run']), output_dir=str(tmpdir))
+
+    def test_run_specs_with_queue_requires_output_dir(self):
+        with pytest.raises(PDProcessorError) as excinfo:
+            run_specs(self.specs(), QueueExecutor(LocalBroker()))
+        assert excinfo.value.message == 'QueueExecutor requires output_dir.'
+
+    def test_run_specs_with_retries(self):
+        error = PDProcessorError('Error!', 'path', 'IOError')
+        executor = Mock(spec=['run'])
+        executor.run.side_effect = [[BatchResult('a', error=error), BatchResult('b')],
+                                    [BatchResult('a', error=error)],
+                                    [BatchResult('a')]]
+        specs = [ProcessorSpec(CLASS_PATH, 'a'), ProcessorSpec(CLASS_PATH, 'b')]
+        results = run_specs(specs, executor, retries=2)
+        assert [result.ok for result in results] == [True, True]
+        assert [result.attempts for result in results] == [3, 1]
+        assert executor.run.call_count == 3
+
+    def test_run_worker_with_timeout(self):
+        assert run_worker(LocalBroker(), timeout=0.01) == 0
+
+    def test_run_worker_with_invalid_task(self):
+        """Test a task failing with an unexpected error still gets a result."""
+
+        broker = LocalBroker()
+        broker.put_task('id', {'spec': {'path': 'path'}})
+        assert run_worker(broker, timeout=0.01) == 1
+        task_id, record = broker.get_result(0)
+        result = BatchResult.from_dict(record)
+        assert task_id == 'id'
+        assert result.error.cause == 'KeyError'
+        assert result.retryable
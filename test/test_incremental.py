@@ -0,0 +1,43 @@
+"""
+Tests for `pdprocessor.incremental` module.
+"""
+import hashlib
+from pdprocessor.incremental import (IncrementalState, row_hashes, rows_checksum,
+                                     complete_size, prefix_checksums)
+
+
+class TestIncrementalState(object):
+
+    def test_save_and_load(self, tmpdir, dataframe):
+        state = IncrementalState(10, 'checksum', dataframe)
+        state.save(str(tmpdir.join('state')))
+        state = IncrementalState.load(str(tmpdir.join('state')))
+        assert state.offset == 10
+        assert state.checksum == 'checksum'
+        assert state.df['Integer'].tolist() == [1, 2]
+
+    def test_load_without_state(self, tmpdir):
+        assert IncrementalState.load(str(tmpdir)) is None
+
+
+class TestChecksums(object):
+
+    def test_rows_checksum(self, dataframe):
+        hashes = row_hashes(dataframe)
+        assert len(hashes) == 2
+        assert rows_checksum(hashes[:1]) == rows_checksum(row_hashes(dataframe.iloc[:1]))
+        assert rows_checksum(hashes[:1]) != rows_checksum(hashes)
+
+    def test_complete_size(self, tmpdir):
+        sfile = tmpdir.join('data.csv')
+        sfile.write('a,b\n1,2\n3')
+        assert complete_size(str(sfile)) == 8
+        sfile.write('a,b')
+        assert complete_size(str(sfile)) == 0
+
+    def test_prefix_checksums(self, tmpdir):
+        sfile = tmpdir.join('data.csv')
+        sfile.write('a,b\n1,2\n')
+        checksums = prefix_checksums(str(sfile), [0, 4, 8])
+        expected = [hashlib.sha1(data).hexdigest() for data in (b'', b'a,b\n', b'a,b\n1,2\n')]
+        assert checksums == expected
@@ -0,0 +1,80 @@
+"""
+Tests for `pdprocessor.instrument` module.
+"""
+import threading
+from mock import Mock
+from pdprocessor.instrument import (StageRecord, StageTimer, active_timers, count_rows,
+                                    start_tracing, stop_tracing)
+
+
+class TestCountRows(object):
+
+    def test_count_rows(self, dataframe):
+        processor = Mock(df=dataframe)
+        assert count_rows(processor) == 2
+
+    def test_count_rows_without_df(self):
+        processor = Mock(df=None)
+        assert count_rows(processor) is None
+
+
+class TestStageTimer(object):
+
+    def test_stage_timer(self, dataframe):
+        processor = Mock(df=dataframe)
+        with StageTimer(processor, 'stage'):
+            processor.df = dataframe.iloc[:1]
+        record = processor.record_stage.call_args[0][0]
+        assert isinstance(record, StageRecord)
+        assert record.name == 'stage'
+        assert record.seconds >= 0
+        assert record.rows_in == 2
+        assert record.rows_out == 1
+        assert record.memory_delta is None
+
+    def test_stage_timer_with_tracing(self, dataframe):
+        processor = Mock(df=dataframe)
+        started = start_tracing()
+        try:
+            with StageTimer(processor, 'outer'):
+                with StageTimer(processor, 'inner'):
+                    data = [0] * 100000
+                del data
+        finally:
+            stop_tracing(started)
+        inner = processor.record_stage.call_args_list[0][0][0]
+        outer = processor.record_stage.call_args_list[1][0][0]
+        assert inner.name == 'inner'
+        assert inner.memory_peak >= 800000
+        assert outer.memory_peak >= inner.memory_peak
+        assert outer.memory_delta < inner.memory_peak
+
+    def test_stage_timer_without_memory(self, dataframe):
+        processor = Mock(df=dataframe)
+        started = start_tracing()
+        try:
+            with StageTimer(processor, 'stage', memory=False):
+                pass
+        finally:
+            stop_tracing(started)
+        record = processor.record_stage.call_args[0][0]
+        assert record.memory_delta is None
+        assert record.memory_peak is None
+
+    def test_active_timers_per_thread(self, dataframe):
+        """Test the timers open in another thread are not nested in this thread's."""
+
+        processor = Mock(df=dataframe)
+        nested = []
+
+        def run():
+            with StageTimer(processor, 'inner'):
+                nested.extend(active_timers())
+
+        with StageTimer(processor, 'outer') as outer:
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+            assert active_timers() == [outer]
+        assert [timer.name for timer in nested] == ['inner']
+        assert active_timers() == []
@@ -0,0 +1,45 @@
+import sys
+import subprocess
+
+from pdprocessor.lazy import LazyModule
+
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.time()
+import pdprocessor
+seconds = time.time() - start
+print('pandas' in sys.modules)
+print(seconds)
+"""
+
+
+class TestLazyModule(object):
+
+    def test_attribute(self):
+        module = LazyModule('json')
+        assert module.dumps([1]) == '[1]'
+        assert module.__dict__['_module'] is not None
+
+    def test_missing_module(self):
+        module = LazyModule('pdprocessor_missing_module')
+        try:
+            module.anything
+        except ImportError:
+            pass
+        else:
+            raise AssertionError('ImportError not raised')
+
+
+class TestImport(object):
+
+    def test_package_exports(self):
+        import pdprocessor
+        from pdprocessor.pdprocessor import CSVPDProcessor
+        assert pdprocessor.CSVPDProcessor is CSVPDProcessor
+
+    def test_import_does_not_import_pandas(self):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT])
+        imported, seconds = output.decode().split()
+        assert imported == 'False'
+        assert float(seconds) < 1.0
@@ -1,11 +1,17 @@
 """
 Tests for `pdprocessor` module.
 """
+import gc
 import os
 import pytest
+import weakref
 import datetime as dt
+import numpy as np
+import pandas as pd
 from mock import Mock
-from pdprocessor.pdprocessor import PDProcessorError, Path, PDProcessor, ExcelPDProcessor
+from pandas.api.types import is_datetime64_any_dtype
+from pdprocessor.pdprocessor import (PDProcessorError, Path, PDProcessor, ExcelPDProcessor,
+                                     WorkbookPDProcessor, CSVPDProcessor)
 
 
 class TestPDProcessorError(object):
@@ -26,6 +32,12 @@ class TestPath(object):
         path = Path(sfile)
         assert path.path == sfile
 
+    def test_validate_path_with_invalid_path(self):
+        path = Path('invalid_path')
+        with pytest.raises(PDProcessorError) as excinfo:
+            path.validate_path()
+        assert excinfo.value.message == "No file found at 'invalid_path'."
+
 
 class TestPDProcessor(object):
 
@@ -57,16 +69,41 @@ class TestPDProcessor(object):
         processor.data_map = data_map
         processor.init_data_map()
         expected = [
-            ('string', 'String', processor.format_uppercase),
-            ('float', 'Float', processor._format_none),
-            ('integer', 'Integer', processor._format_none),
-            ('date', 'Date', processor.format_date),
+            ('string', 'String', 'format_uppercase', PDProcessor.format_uppercase, 0, None),
+            ('float', 'Float', '_format_none', PDProcessor._format_none, 1, None),
+            ('integer', 'Integer', '_format_none', PDProcessor._format_none, 2, None),
+            ('date', 'Date', 'format_date', PDProcessor.format_date, 3, None),
         ]
-        assert processor.data_map == expected
-        expected = list(set(['String', 'Float', 'Integer', 'Date']))
-        assert processor.source_cols == expected
+        assert list(processor.plan.entries) == expected
+        assert processor.data_map == data_map
+        assert processor.source_cols == ['String', 'Float', 'Integer', 'Date']
         assert processor.final_cols == ['string', 'float', 'integer', 'date']
 
+    def test_init_data_map_shares_plan(self, data_map):
+        """Test instances with the same data_map share the plan."""
+
+        processor = PDProcessor('path')
+        processor.data_map = data_map
+        processor.init_data_map()
+        other = PDProcessor('other')
+        other.data_map = list(data_map)
+        other.init_data_map()
+        assert other.plan is processor.plan
+        assert hash(other.plan) == hash(processor.plan)
+
+    def test_init_data_map_source_cols_order(self):
+        """Test source_cols are in the order they first appear."""
+
+        processor = PDProcessor('path')
+        processor.data_map = [
+            ('b', 'B', None),
+            ('a', 'A', None),
+            ('upper_b', 'B', 'format_uppercase'),
+        ]
+        processor.init_data_map()
+        assert processor.source_cols == ['B', 'A']
+        assert [entry.source_index for entry in processor.plan.entries] == [0, 1, 0]
+
     def test_init_data_map_with_data_map_none(self):
         """Ensure error occurs when data_map is None."""
 
@@ -132,6 +169,25 @@ class TestPDProcessor(object):
         expected = "Expected column 'Byte' is not in the source file."
         assert e.message == expected
 
+    def test_validate_dataframe_with_missing_columns(self, dataframe):
+        """Test validate_dataframe reports all the missing columns."""
+
+        processor = PDProcessor('path')
+        processor.source_cols = ['String', 'Byte', 'Float', 'Word']
+        processor.df = dataframe
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.validate_dataframe()
+        expected = "Expected columns 'Byte', 'Word' are not in the source file."
+        assert excinfo.value.message == expected
+
+    def test_validate_header_without_header(self):
+        """Test validate_header is skipped when read_header returns None."""
+
+        processor = PDProcessor('path')
+        processor.source_cols = ['String']
+        assert processor.read_header() is None
+        processor.validate_header()
+
     def test_format_uppercase(self):
         """Test format none."""
 
@@ -170,6 +226,223 @@ class TestPDProcessor(object):
         expected = sdate.date()
         assert data == expected
 
+    def test_format_uppercase_column(self, dataframe):
+        """Test format_uppercase_column."""
+
+        processor = PDProcessor('path')
+        data = processor.format_uppercase_column(dataframe['String'])
+        assert data.tolist() == ['STRING', 'STRING']
+
+    def test_format_uppercase_column_with_mixed_column(self):
+        """Test values that are not strings fail instead of becoming NaN."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['ab', 12, None], dtype=object)
+        with pytest.raises(AttributeError):
+            processor.format_uppercase_column(column)
+
+    def test_format_none_column(self, dataframe):
+        """Test _format_none_column returns the column without a copy."""
+
+        processor = PDProcessor('path')
+        column = dataframe['Float']
+        assert processor._format_none_column(column) is column
+
+    def test_format_date_column_with_strings(self, dataframe):
+        """Test format_date_column with strings."""
+
+        processor = PDProcessor('path')
+        data = processor.format_date_column(dataframe['Date'])
+        expected = [dt.datetime(1970, 5, 6).date(), dt.datetime(2017, 11, 18).date()]
+        assert data.tolist() == expected
+
+    def test_format_date_column_with_mixed(self):
+        """Test format_date_column with strings, dates and datetimes."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['05/06/1970', dt.datetime(1970, 5, 7).date(),
+                            dt.datetime(1970, 5, 8, 12, 0)], dtype=object)
+        data = processor.format_date_column(column)
+        expected = [
+            dt.datetime(1970, 5, 6).date(),
+            dt.datetime(1970, 5, 7).date(),
+            dt.datetime(1970, 5, 8).date(),
+        ]
+        assert data.tolist() == expected
+
+    def test_format_date_column_with_mixed_non_dates(self):
+        """Test values that are not dates fail like they do in format_date."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['5/6/1970', None, dt.datetime(1970, 5, 8, 12, 0)], dtype=object)
+        data = processor.format_date_column(column)
+        assert data.tolist()[0] == dt.date(1970, 5, 6)
+        assert pd.isnull(data.tolist()[1])
+        assert data.tolist()[2] == dt.date(1970, 5, 8)
+        with pytest.raises(TypeError):
+            processor.format_date_column(pd.Series(['5/6/1970', 1.5], dtype=object))
+
+    def test_get_date_formats(self):
+        """Test get_date_formats with a date format and a list of formats."""
+
+        processor = PDProcessor('path')
+        assert processor.get_date_formats() == ['%m/%d/%Y']
+        processor.set_date_format(('%Y-%m-%d', '%m/%d/%Y'))
+        assert processor.get_date_formats() == ['%Y-%m-%d', '%m/%d/%Y']
+
+    def test_format_date_with_date_formats(self):
+        """Test format_date tries the date formats in order."""
+
+        processor = PDProcessor('path')
+        processor.set_date_format(['%Y-%m-%d', '%m/%d/%Y'])
+        assert processor.format_date('1970-05-06') == dt.datetime(1970, 5, 6).date()
+        assert processor.format_date('05/07/1970') == dt.datetime(1970, 5, 7).date()
+        with pytest.raises(ValueError):
+            processor.format_date('May 8 1970')
+
+    def test_parse_date_strings(self):
+        """Test parse_date_strings with repeated and missing values."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['05/06/1970', None, '05/06/1970', '11/18/2017'],
+                           index=[10, 11, 12, 13])
+        data = processor.parse_date_strings(column)
+        assert data.index.tolist() == [10, 11, 12, 13]
+        assert data.isnull().tolist() == [False, True, False, False]
+        expected = [dt.date(1970, 5, 6), dt.date(1970, 5, 6), dt.date(2017, 11, 18)]
+        assert data.dropna().tolist() == expected
+
+    def test_parse_date_strings_with_date_formats(self):
+        """Test parse_date_strings with a list of date formats."""
+
+        processor = PDProcessor('path')
+        processor.set_date_format(['%Y-%m-%d', '%m/%d/%Y'])
+        column = pd.Series(['1970-05-06', '05/07/1970'])
+        data = processor.parse_date_strings(column)
+        assert data.tolist() == [dt.date(1970, 5, 6), dt.date(1970, 5, 7)]
+
+    def test_parse_date_strings_with_sentinel(self):
+        """Test dates outside the nanosecond timestamp range, such as 12/31/9999."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['12/31/9999', '5/6/1970', '12/31/9999'])
+        data = processor.parse_date_strings(column)
+        assert data.tolist() == [dt.date(9999, 12, 31), dt.date(1970, 5, 6),
+                                 dt.date(9999, 12, 31)]
+        data = processor.format_date_column(column)
+        assert data.tolist()[0] == dt.date(9999, 12, 31)
+        data = processor.validate_date_column(pd.Series(['12/31/9999', 'not a date']))
+        assert data.tolist() == [False, True]
+
+    def test_parse_date_strings_out_of_timestamp_range(self, monkeypatch):
+        """Test strings pandas can not parse to a timestamp are parsed with format_date."""
+
+        to_datetime = pd.to_datetime
+
+        def ns_to_datetime(values, **kwargs):
+            return to_datetime(values.where(values != '12/31/9999'), **kwargs)
+
+        monkeypatch.setattr(pd, 'to_datetime', ns_to_datetime)
+        processor = PDProcessor('path')
+        data = processor.parse_date_strings(pd.Series(['12/31/9999', '5/6/1970']))
+        assert data.tolist() == [dt.date(9999, 12, 31), dt.date(1970, 5, 6)]
+
+    def test_parse_date_strings_with_invalid_date(self):
+        """Ensure a string matching no date format raises a ValueError."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['05/06/1970', 'not a date'])
+        with pytest.raises(ValueError) as excinfo:
+            processor.parse_date_strings(column)
+        expected = "time data 'not a date' does not match format '%m/%d/%Y'"
+        assert str(excinfo.value) == expected
+
+    def test_validate_uppercase_column(self):
+        """Test validate_uppercase_column finds values that are not strings."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['a', 1, None], dtype=object)
+        data = processor.validate_uppercase_column(column)
+        assert data.tolist() == [False, True, False]
+        data = processor.validate_uppercase_column(pd.Series([1, 2]))
+        assert data.tolist() == [True, True]
+
+    def test_validate_date_column(self):
+        """Test validate_date_column finds values that are not dates."""
+
+        processor = PDProcessor('path')
+        column = pd.Series(['05/06/1970', 'not a date', None])
+        data = processor.validate_date_column(column)
+        assert data.tolist() == [False, True, False]
+        column = pd.Series(['05/06/1970', dt.datetime(1970, 5, 6).date(), 5, None],
+                           dtype=object)
+        data = processor.validate_date_column(column)
+        assert data.tolist() == [False, False, True, False]
+
+    def test_format_dataframe_with_quarantine(self, dataframe, data_map):
+        """Test format_dataframe quarantines the rows it can not format."""
+
+        processor = PDProcessor('path')
+        processor.quarantine = True
+        processor.data_map = data_map
+        processor.init_data_map()
+        df = dataframe.copy()
+        df.loc[1, 'Date'] = 'not a date'
+        processor.df = df
+        processor.format_dataframe()
+        assert processor.df['integer'].tolist() == [1]
+        assert processor.quarantined['Integer'].tolist() == [2]
+        expected = ["Invalid value in column 'Date' for format_date."]
+        assert processor.quarantined['reason'].tolist() == expected
+
+    def test_format_dataframe_with_quarantine_and_sentinel_date(self, dataframe, data_map):
+        """Test a 12/31/9999 date is formatted and an invalid one quarantined."""
+
+        processor = PDProcessor('path')
+        processor.quarantine = True
+        processor.data_map = data_map
+        processor.init_data_map()
+        processor.df = dataframe.assign(Date=['12/31/9999', 'not a date'])
+        processor.format_dataframe()
+        assert processor.df['date'].tolist() == [dt.date(9999, 12, 31)]
+        assert processor.quarantined['Date'].tolist() == ['not a date']
+
+    def test_format_dataframe_with_max_errors(self, dataframe, data_map):
+        """Ensure an error occurs when more than max_errors rows are invalid."""
+
+        processor = PDProcessor('path')
+        processor.quarantine = True
+        processor.max_errors = 1
+        processor.data_map = data_map
+        processor.init_data_map()
+        processor.df = dataframe.assign(Date='not a date')
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.format_dataframe()
+        expected = '2 rows failed validation, the maximum is 1.'
+        assert excinfo.value.message == expected
+
+    def test_format_column_with_column_formatter(self, dataframe):
+        """Test format_column uses the column formatter."""
+
+        processor = PDProcessor('path')
+        processor.format_uppercase_column = Mock(return_value='formatted')
+        column = dataframe['String']
+        data = processor.format_column(column, processor.format_uppercase)
+        assert data == 'formatted'
+        args, kwargs = processor.format_uppercase_column.call_args
+        assert args[0] is column
+
+    def test_format_column_without_column_formatter(self, dataframe):
+        """Test format_column applies a formatter to each value."""
+
+        class Processor(PDProcessor):
+            def format_lowercase(self, data):
+                return data.lower()
+
+        processor = Processor('path')
+        data = processor.format_column(dataframe['String'], processor.format_lowercase)
+        assert data.tolist() == ['string', 'string']
+
     def test_format_dataframe(self, dataframe, data_map):
         """Test format_dataframe."""
 
@@ -186,6 +459,324 @@ class TestPDProcessor(object):
         expected = [dt.datetime(1970, 05, 06).date(), dt.datetime(2017, 11, 18).date()]
         assert processor.df['date'].tolist() == expected
 
+    def test_format_dataframe_without_copy(self, dataframe):
+        """Test columns without a formatter share the source data."""
+
+        processor = PDProcessor('path')
+        processor.data_map = [('float', 'Float', None), ('upper', 'String', 'format_uppercase'),
+                              ('string', 'String', None)]
+        processor.init_data_map()
+        column = dataframe['Float']
+        processor.df = dataframe
+        processor.format_dataframe()
+        assert processor.df.columns.tolist() == ['float', 'upper', 'string']
+        assert np.shares_memory(processor.df['float'].values, column.values)
+        assert processor.df['upper'].tolist() == ['STRING', 'STRING']
+
+    def test_init_data_map_with_chain(self):
+        """Test a list of formatters compiles to a FormatterChain."""
+
+        processor = PDProcessor('path')
+        processor.data_map = [('upper', 'String', ['format_uppercase', None])]
+        processor.init_data_map()
+        entry = processor.plan.entries[0]
+        assert entry.formatter_name == ('format_uppercase', '_format_none')
+        assert entry.formatter.formatters == (PDProcessor.format_uppercase,
+                                              PDProcessor._format_none)
+        assert processor.is_vectorized(entry.formatter)
+
+    def test_format_dataframe_with_staticmethod_formatter(self, dataframe):
+        """Test a staticmethod formatter is called with the value only."""
+
+        class StaticProcessor(PDProcessor):
+            @staticmethod
+            def format_lower(data):
+                return data.lower()
+
+        processor = StaticProcessor('path')
+        processor.data_map = [('lower', 'String', 'format_lower')]
+        processor.init_data_map()
+        processor.df = dataframe
+        processor.format_dataframe()
+        assert processor.df['lower'].tolist() == ['string', 'string']
+
+    def test_format_dataframe_with_instance_formatter(self, dataframe):
+        """Test a formatter set on the instance is used."""
+
+        processor = PDProcessor('path')
+        processor.format_lower = lambda data: data.lower()
+        processor.data_map = [('lower', 'String', 'format_lower')]
+        processor.init_data_map()
+        assert processor.plan.entries[0].formatter is None
+        processor.df = dataframe
+        processor.format_dataframe()
+        assert processor.df['lower'].tolist() == ['string', 'string']
+
+    def test_init_data_map_with_formatter_not_callable(self):
+        """Test an attribute that is not callable is rejected as formatter."""
+
+        processor = PDProcessor('path')
+        processor.data_map = [('final', 'initial', 'path')]
+        with pytest.raises(PDProcessorError) as e:
+            processor.init_data_map()
+        assert e.value.message == "Formatter 'path' is not defined."
+
+    def test_plans_released_with_class(self, data_map):
+        """Test the plans of a class are not kept after the class is released."""
+
+        class TemporaryProcessor(PDProcessor):
+            pass
+
+        processor = TemporaryProcessor('path')
+        processor.data_map = data_map
+        processor.init_data_map()
+        ref = weakref.ref(TemporaryProcessor)
+        del processor, TemporaryProcessor
+        gc.collect()
+        assert ref() is None
+
+    def test_format_dataframe_with_vectorized_chain(self, dataframe):
+        """Test a shared chain prefix is formatted once."""
+
+        processor = PDProcessor('path')
+        processor.data_map = [('upper', 'String', ['format_uppercase']),
+                              ('upper2', 'String', ['format_uppercase', None])]
+        processor.init_data_map()
+        processor.df = dataframe
+        processor.format_uppercase_column = Mock(side_effect=lambda column: column.str.upper())
+        processor.format_dataframe()
+        assert processor.df['upper'].tolist() == ['STRING', 'STRING']
+        assert processor.df['upper2'].tolist() == ['STRING', 'STRING']
+        assert processor.format_uppercase_column.call_count == 1
+
+    def test_format_dataframe_with_fused_chains(self, dataframe):
+        """Test a prefix shared by chains that are not vectorized is formatted once."""
+
+        class Processor(PDProcessor):
+            calls = 0
+
+            def format_strip(self, data):
+                Processor.calls += 1
+                return data.strip('g')
+
+            def format_reverse(self, data):
+                return data[::-1]
+
+        processor = Processor('path')
+        processor.data_map = [('strip', 'String', ['format_strip', 'format_uppercase']),
+                              ('string', 'String', None),
+                              ('reverse', 'String', ['format_strip', 'format_reverse'])]
+        processor.init_data_map()
+        processor.df = dataframe
+        processor.format_dataframe()
+        assert processor.df['strip'].tolist() == ['STRIN', 'STRIN']
+        assert processor.df['string'].tolist() == ['string', 'string']
+        assert processor.df['reverse'].tolist() == ['nirts', 'nirts']
+        assert Processor.calls == 2
+
+    def test_format_dataframe_with_chain_prefix_of_chain(self, dataframe):
+        """Test a chain that is the prefix of another chain is kept as a result."""
+
+        class Processor(PDProcessor):
+            def format_strip(self, data):
+                return data.strip('g')
+
+            def format_reverse(self, data):
+                return data[::-1]
+
+        processor = Processor('path')
+        processor.data_map = [('strip', 'String', ['format_strip']),
+                              ('reverse', 'String', ['format_strip', 'format_reverse'])]
+        processor.init_data_map()
+        processor.df = dataframe
+        processor.format_column = Mock(side_effect=PDProcessor.format_column.__get__(processor))
+        processor.format_dataframe()
+        assert processor.df['strip'].tolist() == ['strin', 'strin']
+        assert processor.df['reverse'].tolist() == ['nirts', 'nirts']
+        assert processor.format_column.call_count == 2
+
+    def test_format_dataframe_with_unshared_chain(self, dataframe):
+        """Test a chain that is not vectorized is applied as one fused function."""
+
+        class Processor(PDProcessor):
+            def format_strip(self, data):
+                return data.strip('g')
+
+            def format_reverse(self, data):
+                return data[::-1]
+
+        processor = Processor('path')
+        processor.data_map = [('reverse', 'String', ['format_strip', 'format_reverse'])]
+        processor.init_data_map()
+        processor.df = dataframe
+        processor.format_column = Mock(side_effect=PDProcessor.format_column.__get__(processor))
+        processor.format_dataframe()
+        assert processor.df['reverse'].tolist() == ['nirts', 'nirts']
+        assert processor.format_column.call_count == 1
+
+    def test_format_dataframe_with_dtype(self, dataframe):
+        """Test format_dataframe converts columns with a dtype."""
+
+        processor = PDProcessor('path')
+        processor.data_map = [('float', 'Float', None, 'float32')]
+        processor.init_data_map()
+        processor.df = dataframe
+        processor.format_dataframe()
+        assert str(processor.df['float'].dtype) == 'float32'
+
+    def test_compact_column(self):
+        """Test compact_column with each kind of column."""
+
+        processor = PDProcessor('path')
+        data = processor.compact_column(pd.Series([1.5, 2.5]))
+        assert str(data.dtype) == 'float32'
+        data = processor.compact_column(pd.Series([1, 2]))
+        assert str(data.dtype) == 'int8'
+        data = processor.compact_column(pd.Series(['a', 'a', 'a', 'b']))
+        assert str(data.dtype) == 'category'
+        data = processor.compact_column(pd.Series(['a', 'b']))
+        assert str(data.dtype) != 'category'
+        data = processor.compact_column(pd.Series(['a', 'b']), category=True)
+        assert str(data.dtype) == 'category'
+        data = processor.compact_column(pd.Series([dt.datetime(1970, 5, 6).date()]))
+        assert is_datetime64_any_dtype(data)
+
+    def test_format_dataframe_with_compact(self, dataframe, data_map):
+        """Test format_dataframe with compact output."""
+
+        processor = PDProcessor('path')
+        processor.compact = True
+        processor.category_cols = ['string']
+        processor.data_map = data_map + [('float64', 'Float', None, 'float64')]
+        processor.init_data_map()
+        processor.df = dataframe
+        processor.format_dataframe()
+        assert str(processor.df['string'].dtype) == 'category'
+        assert str(processor.df['float'].dtype) == 'float32'
+        assert str(processor.df['float64'].dtype) == 'float64'
+        assert str(processor.df['integer'].dtype) == 'int8'
+        assert is_datetime64_any_dtype(processor.df['date'])
+
+    def test_process_twice(self, dataframe, data_map):
+        """Test process can run twice on the same processor."""
+
+        sfile = os.path.join(os.path.dirname(__file__), __file__)
+        processor = PDProcessor(sfile)
+        processor.data_map = data_map
+        processor.df = dataframe
+        processor.process()
+        processor.df = dataframe
+        processor.process()
+        assert processor.df['string'].tolist() == ['STRING', 'STRING']
+
+    def test_process_with_instrument(self, dataframe, data_map):
+        """Test process records each stage and formatter column."""
+
+        sfile = os.path.join(os.path.dirname(__file__), __file__)
+        processor = PDProcessor(sfile)
+        processor.instrument = True
+        processor.data_map = data_map
+        processor.df = dataframe
+        processor.process()
+        expected = [
+            'validate_path', 'init_data_map', 'validate_header', 'create_dataframe',
+            'validate_dataframe', 'preprocess', 'format_dataframe:string',
+            'format_dataframe:float', 'format_dataframe:integer',
+            'format_dataframe:date', 'format_dataframe', 'postprocess',
+        ]
+        assert [record.name for record in processor.report] == expected
+        record = processor.report[-1]
+        assert record.rows_in == 2
+        assert record.rows_out == 2
+        assert record.memory_peak is None
+
+    def test_process_with_instrument_memory(self, dataframe, data_map):
+        """Test process measures the memory of the stages when instrument is 'memory'."""
+
+        sfile = os.path.join(os.path.dirname(__file__), __file__)
+        processor = PDProcessor(sfile)
+        processor.instrument = 'memory'
+        processor.data_map = data_map
+        processor.df = dataframe
+        processor.process()
+        record = processor.report[-1]
+        assert record.name == 'postprocess'
+        assert record.memory_peak is not None
+
+    def test_process_chunks_with_instrument(self, csvpdprocessor, excel_data_map):
+        """Test process_chunks records the stages like process."""
+
+        processor = csvpdprocessor
+        processor.instrument = True
+        processor.data_map = [('Qty', 'Units', None)]
+        list(processor.process_chunks(30))
+        names = [record.name for record in processor.report]
+        assert names[:5] == ['validate_path', 'init_data_map', 'validate_header',
+                             'create_dataframe', 'validate_dataframe']
+        assert names.count('create_dataframe') == 3
+        assert names.count('format_dataframe') == 2
+        assert names.count('format_dataframe:Qty') == 2
+
+    def test_process_incremental_with_instrument(self, csvpdprocessor, excel_data_map):
+        """Test process_incremental records its stages."""
+
+        processor = csvpdprocessor
+        processor.instrument = True
+        processor.data_map = excel_data_map
+        processor.process_incremental()
+        names = [record.name for record in processor.report]
+        assert 'create_dataframe' in names
+        assert names[-1] == 'postprocess'
+
+    def test_record_stage(self, dataframe, data_map):
+        """Test record_stage can be overridden to export records."""
+
+        class Processor(PDProcessor):
+            instrument = True
+            exported = []
+
+            def record_stage(self, record):
+                super(Processor, self).record_stage(record)
+                self.exported.append(record.name)
+
+        sfile = os.path.join(os.path.dirname(__file__), __file__)
+        processor = Processor(sfile)
+        processor.data_map = data_map
+        processor.df = dataframe
+        processor.process()
+        assert processor.exported == [record.name for record in processor.report]
+
+    def test_process_incremental(self, dataframe, data_map):
+        """Test process_incremental formats only the appended rows."""
+
+        sfile = os.path.join(os.path.dirname(__file__), __file__)
+        processor = PDProcessor(sfile)
+        processor.data_map = data_map
+        processor.df = dataframe.iloc[:1]
+        state = processor.process_incremental()
+        assert state.offset == 1
+        processor.df = dataframe
+        processor.format_column = Mock(wraps=processor.format_column)
+        state = processor.process_incremental(state)
+        assert state.offset == 2
+        assert processor.format_column.call_args_list[0][0][0].tolist() == ['string']
+        assert processor.df['string'].tolist() == ['STRING', 'STRING']
+        assert processor.df.index.tolist() == [0, 1]
+
+    def test_process_incremental_with_changed_rows(self, dataframe, data_map):
+        """Test process_incremental processes all rows when they changed."""
+
+        sfile = os.path.join(os.path.dirname(__file__), __file__)
+        processor = PDProcessor(sfile)
+        processor.data_map = data_map
+        processor.df = dataframe.iloc[:1]
+        state = processor.process_incremental()
+        df = dataframe.copy()
+        df.loc[0, 'Integer'] = 10
+        processor.df = df
+        state = processor.process_incremental(state)
+        assert processor.df['integer'].tolist() == [10, 2]
+
     def test_process(self, dataframe, data_map):
         """Test process."""
 
@@ -206,9 +797,59 @@ class TestPDProcessor(object):
         expected = [1, 2]
         assert processor.df['integer'].tolist() == expected
 
+    def test_create_dataframe_chunks(self, dataframe):
+        """Test create_dataframe_chunks splits the dataframe."""
+
+        processor = PDProcessor('path')
+        processor.df = dataframe
+        chunks = list(processor.create_dataframe_chunks(1))
+        assert len(chunks) == 2
+        assert chunks[0]['Integer'].tolist() == [1]
+        assert chunks[1]['Integer'].tolist() == [2]
+
+    def test_create_dataframe_chunks_with_invalid_chunksize(self, dataframe):
+        """Ensure error occurs when chunksize is not positive."""
+
+        processor = PDProcessor('path')
+        processor.df = dataframe
+        with pytest.raises(PDProcessorError) as excinfo:
+            list(processor.create_dataframe_chunks(0))
+        assert excinfo.value.message == 'chunksize must be a positive integer.'
+
+    def test_process_chunks(self, dataframe, data_map):
+        """Test process_chunks."""
+
+        sfile = os.path.join(os.path.dirname(__file__), __file__)
+        processor = PDProcessor(sfile)
+        processor.data_map = data_map
+        processor.df = dataframe
+        processor.validate_dataframe = Mock()
+        processor.postprocess = Mock()
+        chunks = list(processor.process_chunks(1))
+        assert len(chunks) == 2
+        assert processor.validate_dataframe.call_count == 1
+        assert processor.postprocess.call_count == 2
+        assert chunks[0].columns.tolist() == ['string', 'float', 'integer', 'date']
+        assert chunks[0]['string'].tolist() == ['STRING']
+        expected = [dt.datetime(2017, 11, 18).date()]
+        assert chunks[1]['date'].tolist() == expected
+
 
 class TestExcelPDProcessor(object):
 
+    def test_read_options_without_legacy_options(self, monkeypatch):
+        """Test options pd.read_excel no longer accepts are left out at their default."""
+
+        monkeypatch.setattr('pdprocessor.pdprocessor.read_excel_parameters',
+                            lambda: frozenset(['sheet_name', 'header', 'usecols']))
+        processor = ExcelPDProcessor('path')
+        processor.encoding = 'utf-8'
+        options = processor.read_options()
+        assert 'squeeze' not in options
+        assert 'date_parser' not in options
+        assert options['encoding'] == 'utf-8'
+        assert options['sheet_name'] == 0
+
     def test_init(self):
         processor = ExcelPDProcessor('path')
         assert processor.sheet_name == 0
@@ -242,6 +883,79 @@ class TestExcelPDProcessor(object):
         assert processor.df.columns.tolist() == expected
         assert processor.df.shape == (43, 7)
 
+    def test_create_dataframe_with_source_cols(self, excelpdprocessor, excel_data_map):
+        """Test create_dataframe parses only the source_cols."""
+
+        processor = excelpdprocessor
+        processor.data_map = excel_data_map
+        processor.init_data_map()
+        processor.create_dataframe()
+        expected = ['OrderDate', 'Region', 'Units', 'Unit Cost', 'Total']
+        assert processor.df.columns.tolist() == expected
+
+    def test_get_usecols(self, excelpdprocessor, excel_data_map):
+        """Test get_usecols selects the source_cols by name."""
+
+        processor = excelpdprocessor
+        assert processor.get_usecols() == None
+        processor.data_map = excel_data_map
+        processor.init_data_map()
+        usecols = processor.get_usecols()
+        assert usecols('Region')
+        assert not usecols('Rep')
+
+    def test_process_with_index_col(self, excelpdprocessor, excel_data_map):
+        """Test the index_col column is parsed when only source_cols are selected."""
+
+        processor = excelpdprocessor
+        processor.index_col = 0
+        processor.data_map = excel_data_map[1:]
+        processor.process()
+        assert processor.df.index.name == 'OrderDate'
+        assert processor.df['Region'].tolist()[0] == 'East'
+
+    def test_get_usecols_with_usecols(self, excelpdprocessor, excel_data_map):
+        """Test an explicit usecols is used as is."""
+
+        processor = excelpdprocessor
+        processor.usecols = 'A:C'
+        processor.data_map = excel_data_map
+        processor.init_data_map()
+        assert processor.get_usecols() == 'A:C'
+
+    def test_validate_dataframe_with_missing_column(self, excelpdprocessor,
+                                                    excel_data_map):
+        """Ensure a missing source column raises a PDProcessorError."""
+
+        processor = excelpdprocessor
+        processor.data_map = excel_data_map + [('Byte', 'Byte', None)]
+        processor.init_data_map()
+        processor.create_dataframe()
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.validate_dataframe()
+        expected = "Expected column 'Byte' is not in the source file."
+        assert excinfo.value.message == expected
+
+    def test_read_header(self, excelpdprocessor):
+        """Test read_header."""
+
+        expected = ['OrderDate', 'Region', 'Rep', 'Item', 'Units', 'Unit Cost',
+                    'Total']
+        assert excelpdprocessor.read_header() == expected
+
+    def test_process_with_missing_columns(self, excelpdprocessor, excel_data_map):
+        """Ensure missing columns are reported before the sheet is parsed."""
+
+        processor = excelpdprocessor
+        processor.data_map = excel_data_map + [('Byte', 'Byte', None),
+                                               ('Word', 'Word', None)]
+        processor.create_dataframe = Mock()
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.process()
+        expected = "Expected columns 'Byte', 'Word' are not in the source file."
+        assert excinfo.value.message == expected
+        assert not processor.create_dataframe.called
+
     def test_validate_dataframe(self, excelpdprocessor, excel_data_map):
         """Test validate_dataframe."""
 
@@ -267,3 +981,362 @@ class TestExcelPDProcessor(object):
         assert processor.df['Date'].tolist()[:2] == expected
         expected = [95, 50]
         assert processor.df['Qty'].tolist()[:2] == expected
+
+    def test_process_with_stream_engine(self, excelpdprocessor, excel_data_map):
+        """Test process with the streaming xlsx reader."""
+
+        pytest.importorskip('openpyxl')
+        processor = excelpdprocessor
+        processor.engine = 'stream'
+        processor.data_map = excel_data_map
+        processor.process()
+        assert processor.df.columns.tolist() == ['Date', 'Region', 'Qty', 'Cost', 'Ext Cost']
+        assert processor.df.shape == (43, 5)
+        assert processor.df['Date'].tolist()[0] == dt.datetime(2016, 1, 6).date()
+        assert processor.df['Qty'].tolist()[:2] == [95, 50]
+
+    def test_validate_header_with_stream_engine(self, excelpdprocessor):
+        """Test validate_header reads the header with the streaming reader."""
+
+        pytest.importorskip('openpyxl')
+        processor = excelpdprocessor
+        processor.engine = 'stream'
+        processor.data_map = [('Date', 'OrderDate', None), ('Missing', 'Missing', None)]
+        processor.init_data_map()
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.validate_header()
+        assert excinfo.value.message == "Expected column 'Missing' is not in the source file."
+
+    def test_create_dataframe_chunks_with_stream_engine(self, excelpdprocessor,
+                                                         excel_data_map):
+        """Test the streaming reader reads the sheet in chunks."""
+
+        pytest.importorskip('openpyxl')
+        processor = excelpdprocessor
+        processor.engine = 'stream'
+        processor.data_map = excel_data_map
+        processor.init_data_map()
+        chunks = list(processor.create_dataframe_chunks(20))
+        assert [len(chunk) for chunk in chunks] == [20, 20, 3]
+        assert chunks[-1].index.tolist() == [40, 41, 42]
+        assert chunks[0].columns.tolist() == ['OrderDate', 'Region', 'Units', 'Unit Cost',
+                                              'Total']
+
+
+class DateExcelPDProcessor(ExcelPDProcessor):
+
+    data_map = [('Date', 'OrderDate', 'format_date')]
+
+
+class QtyExcelPDProcessor(ExcelPDProcessor):
+
+    data_map = [('Qty', 'Units', None), ('Region', 'Region', 'format_uppercase')]
+
+
+class TestWorkbookPDProcessor(object):
+
+    def test_init(self):
+        processor = WorkbookPDProcessor('path')
+        assert processor.sheets == None
+        assert processor.engine == None
+        assert processor.sheet_col == None
+        assert processor.threads == 1
+
+    def test_process_with_sheets_none(self):
+        processor = WorkbookPDProcessor('data/SampleData.xlsx')
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.process()
+        assert excinfo.value.message == 'sheets is None.'
+
+    def test_create_processors(self):
+        processor = WorkbookPDProcessor('data/SampleData.xlsx')
+        processor.sheets = [('SalesOrders', DateExcelPDProcessor),
+                            (0, QtyExcelPDProcessor)]
+        processors = processor.create_processors()
+        assert [p.sheet_name for p in processors] == ['SalesOrders', 0]
+        assert processors[1].source_cols == ['Units', 'Region']
+
+    def test_process(self):
+        processor = WorkbookPDProcessor('data/SampleData.xlsx')
+        processor.sheets = [('SalesOrders', DateExcelPDProcessor),
+                            (0, QtyExcelPDProcessor)]
+        processor.threads = 2
+        processor.process()
+        assert list(processor.dfs.keys()) == ['SalesOrders', 0]
+        assert processor.dfs['SalesOrders'].columns.tolist() == ['Date']
+        assert processor.dfs[0].shape == (43, 2)
+        assert processor.dfs[0]['Region'].tolist()[0] == 'EAST'
+
+    def test_process_with_sheet_col(self):
+        processor = WorkbookPDProcessor('data/SampleData.xlsx')
+        processor.sheets = [('SalesOrders', DateExcelPDProcessor),
+                            (0, QtyExcelPDProcessor)]
+        processor.sheet_col = 'Sheet'
+        processor.process()
+        assert processor.df.shape == (86, 4)
+        assert processor.df['Sheet'].unique().tolist() == ['SalesOrders', 0]
+
+    def test_process_with_instrument(self):
+        """Test process records the stages of the sheet processors."""
+
+        class Processor(QtyExcelPDProcessor):
+            instrument = True
+            exported = []
+
+            def record_stage(self, record):
+                self.exported.append(record.name)
+
+        processor = WorkbookPDProcessor('data/SampleData.xlsx')
+        processor.sheets = [(0, Processor)]
+        processor.process()
+        assert Processor.exported == [
+            'init_data_map', 'validate_header', 'create_dataframe', 'validate_dataframe',
+            'preprocess', 'format_dataframe:Qty', 'format_dataframe:Region',
+            'format_dataframe', 'postprocess']
+
+
+class TestCSVPDProcessor(object):
+
+    def test_init(self):
+        processor = CSVPDProcessor('path')
+        assert processor.sep == ','
+        assert processor.header == 0
+        assert processor.skiprows == 0
+        assert processor.usecols == None
+        assert processor.dtype == None
+        assert processor.engine == 'c'
+        assert processor.encoding == None
+        assert processor.data_map == None
+
+    def test_create_dataframe(self, csvpdprocessor):
+        """Test create_dataframe parses all columns before init_data_map."""
+
+        processor = csvpdprocessor
+        processor.create_dataframe()
+        expected = ['OrderDate', 'Region', 'Rep', 'Item', 'Units', 'Unit Cost',
+                    'Total']
+        assert processor.df.columns.tolist() == expected
+        assert processor.df.shape == (43, 7)
+
+    def test_create_dataframe_with_source_cols(self, csvpdprocessor, excel_data_map):
+        """Test create_dataframe parses only the source_cols."""
+
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map
+        processor.init_data_map()
+        processor.create_dataframe()
+        expected = ['OrderDate', 'Region', 'Units', 'Unit Cost', 'Total']
+        assert processor.df.columns.tolist() == expected
+
+    def test_process_with_index_col(self, csvpdprocessor, excel_data_map):
+        """Test the index_col column is parsed when only source_cols are selected."""
+
+        processor = csvpdprocessor
+        processor.index_col = 0
+        processor.data_map = excel_data_map[1:]
+        processor.process()
+        assert processor.df.index.name == 'OrderDate'
+        assert processor.df['Region'].tolist()[0] == 'East'
+
+    def test_get_usecols_with_parse_dates(self, csvpdprocessor, excel_data_map):
+        processor = csvpdprocessor
+        processor.parse_dates = ['OrderDate']
+        processor.data_map = excel_data_map[1:]
+        processor.init_data_map()
+        assert processor.get_usecols() is None
+
+    def test_get_usecols_with_usecols(self, csvpdprocessor, excel_data_map):
+        """Test an explicit usecols is used as is."""
+
+        processor = csvpdprocessor
+        processor.usecols = ['Region']
+        processor.data_map = excel_data_map
+        processor.init_data_map()
+        assert processor.get_usecols() == ['Region']
+
+    def test_validate_dataframe_with_missing_column(self, csvpdprocessor,
+                                                    excel_data_map):
+        """Ensure a missing source column raises a PDProcessorError."""
+
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map + [('Byte', 'Byte', None)]
+        processor.init_data_map()
+        processor.create_dataframe()
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.validate_dataframe()
+        expected = "Expected column 'Byte' is not in the source file."
+        assert excinfo.value.message == expected
+
+    def test_process(self, csvpdprocessor, excel_data_map):
+        """Test process."""
+
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map
+        processor.process()
+        expected = ['Date', 'Region', 'Qty', 'Cost', 'Ext Cost']
+        assert processor.df.columns.tolist() == expected
+        assert processor.df.shape == (43, 5)
+        expected = [
+            dt.datetime(2016, 1, 6).date(),
+            dt.datetime(2016, 1, 23).date(),
+        ]
+        assert processor.df['Date'].tolist()[:2] == expected
+        expected = [95, 50]
+        assert processor.df['Qty'].tolist()[:2] == expected
+
+    def test_process_with_missing_column(self, csvpdprocessor, excel_data_map):
+        """Ensure a missing column is reported before the file is parsed."""
+
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map + [('Byte', 'Byte', None)]
+        processor.create_dataframe = Mock()
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.process()
+        expected = "Expected column 'Byte' is not in the source file."
+        assert excinfo.value.message == expected
+        assert not processor.create_dataframe.called
+
+    def test_process_chunks_with_quarantine(self, tmpdir, excel_data_map):
+        """Test quarantined rows accumulate over the chunks."""
+
+        lines = open('data/SampleData.csv').readlines()
+        lines[2] = 'not a date' + lines[2][lines[2].index(','):]
+        lines[30] = 'not a date' + lines[30][lines[30].index(','):]
+        sfile = tmpdir.join('data.csv')
+        sfile.write(''.join(lines))
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        processor.quarantine = True
+        chunks = list(processor.process_chunks(20))
+        assert sum(len(chunk) for chunk in chunks) == 41
+        assert processor.quarantined.index.tolist() == [1, 29]
+
+    def test_process_chunks(self, csvpdprocessor, excel_data_map):
+        """Test process_chunks reads the file in chunks."""
+
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map
+        chunks = list(processor.process_chunks(20))
+        assert [len(chunk) for chunk in chunks] == [20, 20, 3]
+        expected = ['Date', 'Region', 'Qty', 'Cost', 'Ext Cost']
+        assert chunks[2].columns.tolist() == expected
+
+    def test_process_incremental(self, tmpdir, excel_data_map):
+        """Test process_incremental parses only the appended lines."""
+
+        lines = open('data/SampleData.csv').readlines()
+        sfile = tmpdir.join('data.csv')
+        sfile.write(''.join(lines[:21]) + lines[21].strip())
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        state = processor.process_incremental()
+        assert processor.df.shape == (20, 5)
+        assert state.offset == len(''.join(lines[:21]))
+        sfile.write(''.join(lines))
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        processor.read_range = Mock(wraps=processor.read_range)
+        state = processor.process_incremental(state)
+        processor.read_range.assert_called_once_with(len(''.join(lines[:21])),
+                                                     len(''.join(lines)))
+        expected = CSVPDProcessor('data/SampleData.csv')
+        expected.data_map = excel_data_map
+        expected.process()
+        assert processor.df.equals(expected.df)
+
+    def test_process_incremental_without_new_lines(self, tmpdir, excel_data_map):
+        sfile = tmpdir.join('data.csv')
+        sfile.write(open('data/SampleData.csv').read())
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        state = processor.process_incremental()
+        assert processor.process_incremental(state) is state
+
+    def test_process_incremental_with_changed_prefix(self, tmpdir, excel_data_map):
+        lines = open('data/SampleData.csv').readlines()
+        sfile = tmpdir.join('data.csv')
+        sfile.write(''.join(lines[:21]))
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        state = processor.process_incremental()
+        sfile.write(''.join(lines[:1] + lines[2:]))
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        state = processor.process_incremental(state)
+        assert processor.df.shape == (42, 5)
+
+    def test_process_incremental_with_skipfooter(self, csvpdprocessor):
+        processor = csvpdprocessor
+        processor.skipfooter = 1
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.process_incremental()
+        expected = 'skipfooter is not supported by process_incremental.'
+        assert excinfo.value.message == expected
+
+    def test_process_with_schema_path(self, tmpdir, csvpdprocessor, excel_data_map):
+        """Test the schema is inferred on the first run and used on later runs."""
+
+        schema_path = str(tmpdir.join('schema.json'))
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map
+        processor.schema_path = schema_path
+        processor.schema_blocks = 2
+        processor.process()
+        assert os.path.isfile(schema_path)
+        assert processor.schema.dtypes['Units'] == 'int64'
+        processor = CSVPDProcessor('data/SampleData.csv')
+        processor.data_map = excel_data_map
+        processor.schema_path = schema_path
+        processor.init_data_map()
+        dtype = processor.get_dtype()
+        assert dtype['Units'] == 'int64'
+        assert dtype['Unit Cost'] == 'float64'
+
+    def test_process_with_schema_drift(self, tmpdir, excel_data_map):
+        """Test values not fitting the schema are reported."""
+
+        lines = open('data/SampleData.csv').readlines()
+        sfile = tmpdir.join('data.csv')
+        sfile.write(''.join(lines))
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        processor.schema_path = str(tmpdir.join('schema.json'))
+        processor.process()
+        values = lines[5].split(',')
+        values[4] = 'many'
+        lines[5] = ','.join(values)
+        sfile.write(''.join(lines))
+        with pytest.raises(PDProcessorError) as excinfo:
+            processor.process()
+        expected = ("Schema drift in '{path}': column 'Units' does not fit int64 in 1 rows "
+                    "such as 'many'.").format(path=str(sfile))
+        assert excinfo.value.message == expected
+        processor.on_schema_drift = 'report'
+        processor.process()
+        assert [item.column for item in processor.schema_drift] == ['Units']
+        assert str(processor.df['Cost'].dtype) == 'float64'
+
+    def test_process_chunks_with_schema_drift(self, tmpdir, excel_data_map):
+        """Test values not fitting the schema are reported for each chunk."""
+
+        lines = open('data/SampleData.csv').readlines()
+        sfile = tmpdir.join('data.csv')
+        sfile.write(''.join(lines))
+        processor = CSVPDProcessor(str(sfile))
+        processor.data_map = excel_data_map
+        processor.schema_path = str(tmpdir.join('schema.json'))
+        processor.process()
+        values = lines[30].split(',')
+        values[4] = 'many'
+        lines[30] = ','.join(values)
+        sfile.write(''.join(lines))
+        with pytest.raises(PDProcessorError) as excinfo:
+            list(processor.process_chunks(20))
+        assert excinfo.value.message.startswith(
+            "Schema drift in '{path}': column 'Units'".format(path=str(sfile)))
+        processor.on_schema_drift = 'report'
+        chunks = list(processor.process_chunks(20))
+        assert [len(df) for df in chunks] == [20, 20, 3]
+        assert [item.column for item in processor.schema_drift] == ['Units']
+        assert processor.schema_drift[0].example == 'many'
+        assert str(chunks[2]['Qty'].dtype) == 'int64'
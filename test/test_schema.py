@@ -0,0 +1,46 @@
+"""
+Tests for `pdprocessor.schema` module.
+"""
+import pandas as pd
+from pdprocessor.schema import Schema, SchemaDrift
+
+
+class TestSchema(object):
+
+    def test_infer(self, dataframe):
+        dataframe['Bool'] = [True, False]
+        dataframe['When'] = pd.to_datetime(dataframe['Date'])
+        schema = Schema.infer(dataframe)
+        expected = [('String', 'str'), ('Float', 'float64'), ('Integer', 'int64'),
+                    ('Date', 'str'), ('Bool', 'bool')]
+        assert list(schema.dtypes.items()) == expected
+
+    def test_save_and_load(self, tmpdir, dataframe):
+        path = str(tmpdir.join('schema.json'))
+        schema = Schema.infer(dataframe)
+        schema.save(path)
+        assert Schema.load(path).dtypes == schema.dtypes
+        assert Schema.load(str(tmpdir.join('missing.json'))) is None
+
+    def test_find_drift(self):
+        schema = Schema([('a', 'int64'), ('b', 'float64'), ('c', 'str')])
+        df = pd.DataFrame({'a': ['1', 'x', None], 'b': ['1.5', None, 'y'],
+                           'c': [1, 'c', None]})
+        expected = [SchemaDrift('a', 'int64', 1, 'x'), SchemaDrift('b', 'float64', 1, 'y')]
+        assert schema.find_drift(df) == expected
+        df = pd.DataFrame({'a': [1.0, 2.0], 'b': [1, 2]})
+        assert schema.find_drift(df) == []
+
+    def test_find_drift_with_missing_values(self):
+        schema = Schema([('a', 'int64'), ('b', 'bool')])
+        df = pd.DataFrame({'a': [1.0, None], 'b': [True, None]})
+        assert schema.find_drift(df) == []
+        df = schema.apply(df)
+        assert str(df['a'].dtype) == 'float64'
+        assert df['b'].tolist()[0] is True
+
+    def test_apply(self):
+        schema = Schema([('a', 'int64'), ('b', 'float64')])
+        df = schema.apply(pd.DataFrame({'a': [1.0, 2.0], 'b': ['x', 'y']}), exclude=['b'])
+        assert str(df['a'].dtype) == 'int64'
+        assert df['b'].tolist() == ['x', 'y']
@@ -0,0 +1,63 @@
+"""
+Tests for `pdprocessor.shared` module.
+"""
+import os
+import pickle
+import multiprocessing
+import pytest
+from pdprocessor.shared import SharedFrame, get_shared_dir
+
+pytest.importorskip('pyarrow')
+
+
+def sum_units(handle):
+    return int(handle.read_table().column('Qty').to_pandas().sum())
+
+
+class TestSharedFrame(object):
+
+    def test_get_shared_dir(self):
+        assert os.path.isdir(get_shared_dir())
+
+    def test_publish(self, tmpdir, dataframe):
+        handle = SharedFrame.publish(dataframe, str(tmpdir))
+        assert os.path.dirname(handle.path) == str(tmpdir)
+        assert handle.num_rows == 2
+        df = handle.read_dataframe()
+        assert df.columns.tolist() == ['String', 'Float', 'Integer', 'Date']
+        assert df['Float'].tolist() == [1.47, 0.0]
+
+    def test_read_table(self, tmpdir, dataframe):
+        handle = SharedFrame.publish(dataframe, str(tmpdir))
+        table = handle.read_table()
+        assert table.num_rows == 2
+        assert table.column('Integer').to_pylist() == [1, 2]
+
+    def test_pickle(self, tmpdir, dataframe):
+        handle = SharedFrame.publish(dataframe, str(tmpdir))
+        other = pickle.loads(pickle.dumps(handle))
+        assert other.path == handle.path
+        assert len(pickle.dumps(handle)) < 500
+
+    def test_unlink(self, tmpdir, dataframe):
+        with SharedFrame.publish(dataframe, str(tmpdir)) as handle:
+            table = handle.read_table()
+        assert not os.path.exists(handle.path)
+        assert table.column('Integer').to_pylist() == [1, 2]
+        handle.unlink()
+
+
+class TestPublish(object):
+
+    def test_publish(self, csvpdprocessor, excel_data_map):
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map
+        processor.process()
+        with processor.publish() as handle:
+            pool = multiprocessing.Pool(1)
+            try:
+                total = pool.apply(sum_units, (handle,))
+            finally:
+                pool.close()
+                pool.join()
+        assert total == processor.df['Qty'].sum()
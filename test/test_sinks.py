@@ -0,0 +1,147 @@
+"""
+Tests for `pdprocessor.sinks` module.
+"""
+import os
+import gzip
+import pytest
+import pandas as pd
+from pdprocessor.pdprocessor import PDProcessorError
+from pdprocessor.sinks import ParquetSink, FeatherSink, CSVSink, get_sink
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+requires_pyarrow = pytest.mark.skipif(pyarrow is None, reason='requires pyarrow')
+
+
+@requires_pyarrow
+class TestParquetSink(object):
+
+    def test_write(self, tmpdir, dataframe):
+        import pyarrow.parquet as pq
+        path = str(tmpdir.join('out.parquet'))
+        with ParquetSink(path, row_group_size=1) as sink:
+            sink.write(dataframe)
+            sink.write(dataframe)
+        assert sink.rows == 4
+        assert pq.ParquetFile(path).num_row_groups == 4
+        df = pd.read_parquet(path)
+        assert df['Integer'].tolist() == [1, 2, 1, 2]
+
+    def test_write_with_chunk_dtypes(self, tmpdir):
+        """Test chunks compacted to different dtypes fit the schema of the file."""
+
+        path = str(tmpdir.join('out.parquet'))
+        with ParquetSink(path) as sink:
+            sink.write(pd.DataFrame({'a': pd.Series([1, 2], dtype='int8'),
+                                     'b': pd.Categorical(['x', 'y'])}))
+            sink.write(pd.DataFrame({'a': pd.Series([300], dtype='int16'),
+                                     'b': pd.Categorical(['z'])}))
+        df = pd.read_parquet(path)
+        assert str(df['a'].dtype) == 'int64'
+        assert df['a'].tolist() == [1, 2, 300]
+        assert df['b'].tolist() == ['x', 'y', 'z']
+
+    def test_write_with_chunk_not_fitting(self, tmpdir):
+        path = str(tmpdir.join('out.parquet'))
+        with ParquetSink(path) as sink:
+            sink.write(pd.DataFrame({'a': [1, 2]}))
+            with pytest.raises(PDProcessorError) as excinfo:
+                sink.write(pd.DataFrame({'a': ['not a number']}))
+        assert excinfo.value.message.startswith('Dataframe does not fit the schema of the sink')
+
+    def test_write_with_partition_col(self, tmpdir, dataframe):
+        path = str(tmpdir.join('out'))
+        with ParquetSink(path, partition_col='Integer') as sink:
+            sink.write(dataframe)
+        assert sorted(os.listdir(path)) == ['Integer=1', 'Integer=2']
+        df = pd.read_parquet(os.path.join(path, 'Integer=2', 'part-0.parquet'))
+        assert df.columns.tolist() == ['String', 'Float', 'Date']
+        assert df['Date'].tolist() == ['11/18/2017']
+
+    def test_write_with_missing_partition_value(self, tmpdir):
+        path = str(tmpdir.join('out'))
+        with ParquetSink(path, partition_col='r') as sink:
+            sink.write(pd.DataFrame({'r': ['a', None, 'b'], 'x': [1, 2, 3]}))
+        assert sink.rows == 3
+        assert sorted(os.listdir(path)) == ['r=__null__', 'r=a', 'r=b']
+        df = pd.read_parquet(os.path.join(path, 'r=__null__', 'part-0.parquet'))
+        assert df['x'].tolist() == [2]
+
+
+@requires_pyarrow
+class TestFeatherSink(object):
+
+    def test_write(self, tmpdir, dataframe):
+        path = str(tmpdir.join('out.feather'))
+        with FeatherSink(path, compression='zstd') as sink:
+            sink.write(dataframe)
+            sink.write(dataframe.iloc[:1])
+        df = pd.read_feather(path)
+        assert df['Float'].tolist() == [1.47, 0.0, 1.47]
+
+
+class TestCSVSink(object):
+
+    def test_write(self, tmpdir, dataframe):
+        path = str(tmpdir.join('out.csv'))
+        with CSVSink(path) as sink:
+            sink.write(dataframe)
+            sink.write(dataframe)
+        df = pd.read_csv(path)
+        assert df.shape == (4, 4)
+
+    def test_write_with_gzip(self, tmpdir, dataframe):
+        path = str(tmpdir.join('out.csv.gz'))
+        with CSVSink(path, compression='gzip') as sink:
+            sink.write(dataframe)
+        with gzip.open(path, 'rt') as f:
+            assert f.readline().strip() == 'String,Float,Integer,Date'
+
+    def test_write_with_invalid_compression(self, tmpdir, dataframe):
+        sink = CSVSink(str(tmpdir.join('out.csv')), compression='rar')
+        with pytest.raises(PDProcessorError) as excinfo:
+            sink.write(dataframe)
+        assert excinfo.value.message == "Compression 'rar' is not supported."
+
+
+class TestGetSink(object):
+
+    def test_get_sink(self):
+        sink = get_sink('feather', 'out.feather', compression='lz4')
+        assert isinstance(sink, FeatherSink)
+        assert sink.compression == 'lz4'
+
+    def test_get_sink_with_invalid_format(self):
+        with pytest.raises(PDProcessorError) as excinfo:
+            get_sink('xml', 'out.xml')
+        assert excinfo.value.message == "Output format 'xml' is not supported."
+
+
+@requires_pyarrow
+class TestProcessToSink(object):
+
+    def test_process_to_sink(self, tmpdir, csvpdprocessor, excel_data_map):
+        path = str(tmpdir.join('out.parquet'))
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map
+        with ParquetSink(path) as sink:
+            processor.process_to_sink(sink)
+        df = pd.read_parquet(path)
+        assert df.shape == (43, 5)
+
+    def test_process_to_sink_with_chunksize(self, tmpdir, csvpdprocessor,
+                                            excel_data_map):
+        import pyarrow.parquet as pq
+        path = str(tmpdir.join('out.parquet'))
+        processor = csvpdprocessor
+        processor.data_map = excel_data_map
+        with ParquetSink(path) as sink:
+            processor.process_to_sink(sink, chunksize=20)
+        assert len(processor.df) == 3
+        assert pq.ParquetFile(path).num_row_groups == 3
+        df = pd.read_parquet(path)
+        assert df.columns.tolist() == ['Date', 'Region', 'Qty', 'Cost', 'Ext Cost']
+        assert df.shape == (43, 5)
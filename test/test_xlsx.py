@@ -0,0 +1,91 @@
+"""
+Tests for `pdprocessor.xlsx` module.
+"""
+import pytest
+import pandas as pd
+from pdprocessor.pdprocessor import PDProcessorError
+from pdprocessor.xlsx import ColumnBuffer, read_xlsx, read_xlsx_header
+
+pytest.importorskip('openpyxl')
+
+SAMPLE = 'data/SampleData.xlsx'
+
+
+class TestColumnBuffer(object):
+
+    def test_int_overflow(self):
+        buffer = ColumnBuffer()
+        buffer.append(1)
+        buffer.append(2 ** 70)
+        assert buffer.kind == 'object'
+        assert buffer.to_series('a', pd.RangeIndex(2)).tolist() == [1, 2 ** 70]
+
+    def test_int(self):
+        buffer = ColumnBuffer()
+        buffer.append(1)
+        buffer.append(2)
+        assert buffer.kind == 'int'
+        data = buffer.to_series('a', pd.RangeIndex(2))
+        assert str(data.dtype) == 'int64'
+        assert data.tolist() == [1, 2]
+
+    def test_float_and_missing(self):
+        buffer = ColumnBuffer()
+        buffer.append(1)
+        buffer.append(None)
+        buffer.append(2.5)
+        assert buffer.kind == 'float'
+        data = buffer.to_series('a', pd.RangeIndex(3))
+        assert str(data.dtype) == 'float64'
+        assert data.isnull().tolist() == [False, True, False]
+
+    def test_object(self):
+        buffer = ColumnBuffer()
+        buffer.append(1.5)
+        buffer.append('a')
+        buffer.append(True)
+        assert buffer.kind == 'object'
+        assert buffer.to_series('a', pd.RangeIndex(3)).tolist() == [1.5, 'a', True]
+
+
+class TestReadXlsx(object):
+
+    def test_read_xlsx(self):
+        df = read_xlsx(SAMPLE)
+        pd.testing.assert_frame_equal(df, pd.read_excel(SAMPLE))
+
+    def test_usecols(self):
+        df = read_xlsx(SAMPLE, usecols=['Units', 'Region'])
+        assert df.columns.tolist() == ['Region', 'Units']
+        df = read_xlsx(SAMPLE, usecols=lambda col: col == 'Total')
+        assert df.columns.tolist() == ['Total']
+        df = read_xlsx(SAMPLE, usecols=[0, 4])
+        assert df.columns.tolist() == ['OrderDate', 'Units']
+
+    def test_usecols_letters(self):
+        with pytest.raises(PDProcessorError) as excinfo:
+            read_xlsx(SAMPLE, usecols='A:C')
+        assert excinfo.value.message == "usecols 'A:C' is not supported by the stream engine."
+
+    def test_skiprows_and_skipfooter(self):
+        options = dict(skiprows=[1, 2], skipfooter=3)
+        pd.testing.assert_frame_equal(read_xlsx(SAMPLE, **options),
+                                      pd.read_excel(SAMPLE, **options))
+
+    def test_header(self):
+        options = dict(header=None, skiprows=1, names=['Date', 'Region'], usecols=[0, 1])
+        df = read_xlsx(SAMPLE, **options)
+        assert df.columns.tolist() == ['Date', 'Region']
+        assert df.shape == (43, 2)
+        df = read_xlsx(SAMPLE, header=1)
+        assert df.columns.tolist()[1] == 'East'
+
+    def test_missing_sheet(self):
+        with pytest.raises(PDProcessorError) as excinfo:
+            read_xlsx(SAMPLE, sheet_name='Missing')
+        assert excinfo.value.message == "Sheet 'Missing' is not in '{0}'.".format(SAMPLE)
+
+    def test_read_xlsx_header(self):
+        header = read_xlsx_header(SAMPLE, skipfooter=3)
+        assert header == ['OrderDate', 'Region', 'Rep', 'Item', 'Units', 'Unit Cost',
+                          'Total']